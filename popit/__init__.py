@@ -0,0 +1,2 @@
+__author__ = 'sweemeng'
+default_app_config = "popit.apps.PopitConfig"
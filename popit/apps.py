@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class PopitConfig(AppConfig):
+    name = "popit"
+
+    def ready(self):
+        # Connect the model signals and everything listening to persons_changed
+        import popit.signals
+        import popit.cache
+        import popit.matching
+        import popit.changes
+        import popit.webhooks
+        import popit.documents
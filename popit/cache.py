@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+from popit.signals import persons_changed
+
+
+def get_cache():
+    return caches[getattr(settings, "POPIT_CACHE", "default")]
+
+
+def cached_languages():
+    # Only languages we know about are cached, every one of them has to be invalidated on write
+    return [code for code, name in settings.LANGUAGES]
+
+
+def person_detail_key(generation, language, pk):
+    return "popit:person:%s:%s:%s" % (language, canonical_id(pk), generation)
+
+
+PERSONS_FRESHNESS_KEY = "popit:freshness"
+
+# Rendered responses are cached under the current generation, see popit.middleware
+RESPONSES_GENERATION_KEY = "popit:responses:generation"
+
+
+def canonical_id(pk):
+    # The same person can be asked for with or without dashes in its id
+    if not isinstance(pk, uuid.UUID):
+        pk = uuid.UUID(pk)
+    return pk.hex
+
+
+def person_generation_key(pk):
+    return "popit:generation:%s" % canonical_id(pk)
+
+
+def person_freshness_key(generation, pk):
+    return "popit:freshness:%s:%s" % (canonical_id(pk), generation)
+
+
+def cache_timeout():
+    return getattr(settings, "POPIT_CACHE_TIMEOUT", 60 * 60)
+
+
+def get_or_set(key, compute):
+    """
+    Value under key, computed and added when missing. Concurrent requests go on with the one added first.
+    A value read from the database may be added after the write that outdates it, so those are kept under
+    a key naming a generation read before them, see person_generation.
+    """
+    value = get_cache().get(key)
+    if value is None:
+        value = compute()
+        get_cache().add(key, value, cache_timeout())
+        value = get_cache().get(key) or value
+    return value
+
+
+def get_person_detail(generation, language, pk):
+    return get_cache().get(person_detail_key(generation, language, pk))
+
+
+def set_person_detail(generation, language, pk, data):
+    # Under the generation read before the person was, see person_generation
+    if language not in cached_languages():
+        return
+    get_cache().set(person_detail_key(generation, language, pk), OrderedDict(data), cache_timeout())
+
+
+def person_generation(pk):
+    # Every write to the person starts a new generation, entries cached under the previous ones are never
+    # read again
+    return get_or_set(person_generation_key(pk), lambda: uuid.uuid4().hex)
+
+
+def responses_generation():
+    # Every write starts a new generation, responses cached under the previous ones are never read again
+    return get_or_set(RESPONSES_GENERATION_KEY, lambda: uuid.uuid4().hex)
+
+
+def response_key(generation, request):
+    # Absolute, as pagination links carry the host. Accept can pick another format.
+    key = "%s|%s" % (request.build_absolute_uri(), request.META.get("HTTP_ACCEPT", ""))
+    return "popit:response:%s:%s" % (generation, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+def invalidate_persons(person_ids):
+    keys = [PERSONS_FRESHNESS_KEY, RESPONSES_GENERATION_KEY]
+    keys.extend(person_generation_key(pk) for pk in set(person_ids))
+    get_cache().delete_many(keys)
+
+
+def invalidate_person(pk):
+    invalidate_persons([pk])
+
+
+@receiver(persons_changed, dispatch_uid="popit_cache_invalidate")
+def persons_changed_handler(sender, changes, **kwargs):
+    invalidate_persons(person_id for person_id, instance, action in changes)
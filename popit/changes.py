@@ -0,0 +1,55 @@
+import datetime
+from django.conf import settings
+from django.dispatch import receiver
+from django.utils import timezone
+from popit.models import PersonChange
+from popit.signals import persons_changed
+
+
+# Every change is logged, one row per saved or deleted object, translations included.
+# Mirrors read the log in id order from the last id they have seen.
+
+# Ids are handed out at insert and rows show up at commit, so a row may appear behind a higher id
+# already served. Rows younger than this many seconds are held back until concurrent writes settle.
+def settle_delay():
+    return getattr(settings, "POPIT_CHANGES_SETTLE_SECONDS", 5)
+
+
+FEED_LIMIT = 500
+MAX_FEED_LIMIT = 5000
+
+
+def change_for(person_id, instance, action):
+    shared_model = getattr(instance._meta, "shared_model", None)
+    if shared_model is not None:
+        return PersonChange(person_id=person_id, model=shared_model._meta.model_name, object_id=instance.master_id,
+                            language_code=instance.language_code, action=action)
+    return PersonChange(person_id=person_id, model=instance._meta.model_name, object_id=instance.id, action=action)
+
+
+@receiver(persons_changed, dispatch_uid="popit_changes_log")
+def persons_changed_handler(sender, changes, **kwargs):
+    PersonChange.objects.bulk_create(change_for(*change) for change in changes)
+
+
+def iter_changes(since=0, limit=FEED_LIMIT):
+    """
+    Changes after the cursor since, oldest first, as compact dicts
+    """
+    changes = PersonChange.objects.filter(id__gt=since).order_by("id")
+    delay = settle_delay()
+    if delay:
+        changes = changes.filter(created_at__lte=timezone.now() - datetime.timedelta(seconds=delay))
+    rows = changes.values_list("id", "person_id", "model", "object_id", "language_code", "action", "created_at")
+    for change_id, person_id, model, object_id, language_code, action, created_at in rows[:limit].iterator():
+        change = {
+            "cursor": change_id,
+            "person": str(person_id),
+            "model": model,
+            "id": str(object_id),
+            "action": action,
+            "at": created_at.isoformat(),
+        }
+        if language_code:
+            change["language_code"] = language_code
+        yield change
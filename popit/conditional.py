@@ -0,0 +1,72 @@
+import hashlib
+import uuid
+from django.utils import timezone
+from popit.models import Person
+from popit import cache
+
+
+# Conditional GET for the person endpoints. Freshness of a person is when it last changed and its version,
+# moved by every change to it, its children or their translations, see popit.signals.send_persons_changed.
+# It is read from the person row alone and cached under the generation of the person, so a 304 costs no
+# serializing. The list would have to scan every table, it is fresh from the first read after a write instead.
+
+
+def person_freshness(pk):
+    row = Person.objects.filter(id=pk).values_list("updated_at", "changed_at", "version").first()
+    if row is None:
+        return None, None
+    updated_at, changed_at, version = row
+    # Persons loaded without signals have never changed
+    return changed_at or updated_at, version
+
+
+def cached_person_freshness(pk):
+    # The generation is read first, a write committing while the person is read moves on from it
+    key = cache.person_freshness_key(cache.person_generation(pk), pk)
+    return cache.get_or_set(key, lambda: person_freshness(pk))
+
+
+def persons_freshness():
+    # Cached until any person changes, so this stands for everything written before now. Any new token will
+    # do as the etag part, it only has to differ from the one of the previous generation.
+    return timezone.now(), uuid.uuid4().hex
+
+
+def cached_persons_freshness():
+    return cache.get_or_set(cache.PERSONS_FRESHNESS_KEY, persons_freshness)
+
+
+def cached_freshness(request, compute):
+    # etag and last modified are asked separately by the condition decorator, look it up once per request
+    if not hasattr(request, "_popit_freshness"):
+        request._popit_freshness = compute()
+    return request._popit_freshness
+
+
+def make_etag(request, last_modified, version):
+    # The path carries language, format and cursor, Accept can pick another format
+    key = "%s|%s|%s|%s" % (request.get_full_path(), request.META.get("HTTP_ACCEPT", ""), last_modified.isoformat(),
+                           version)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def person_etag(request, language, pk, format=None):
+    last_modified, version = cached_freshness(request, lambda: cached_person_freshness(pk))
+    if last_modified is None:
+        return None
+    return make_etag(request, last_modified, version)
+
+
+def person_last_modified(request, language, pk, format=None):
+    return cached_freshness(request, lambda: cached_person_freshness(pk))[0]
+
+
+def persons_etag(request, language, format=None):
+    last_modified, token = cached_freshness(request, cached_persons_freshness)
+    if last_modified is None:
+        return None
+    return make_etag(request, last_modified, token)
+
+
+def persons_last_modified(request, language, format=None):
+    return cached_freshness(request, cached_persons_freshness)[0]
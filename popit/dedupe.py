@@ -0,0 +1,252 @@
+import itertools
+import multiprocessing
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from popit.matching import similarity
+from popit.matching import trigrams
+from popit.models import Contact
+from popit.models import Identifier
+from popit.models import Link
+from popit.models import OtherName
+from popit.models import Person
+from popit.models import PersonNameKey
+from popit.signals import deferred_person_changes
+from popit.signals import person_changed
+
+
+# Duplicate detection only compares persons sharing a block: the same name key, the same identifier
+# value, or the same birth date and a common name word. Blocks larger than this are too common to mean
+# anything, "muhammad" born on 1970-01-01, and are skipped.
+MAX_BLOCK_SIZE = 50
+
+# Pairs sent to a worker at once
+SCORE_CHUNK_SIZE = 2000
+
+# Shared fields a merged person takes from its duplicates when it has no value of its own
+MERGED_FIELDS = ("email", "birth_date", "death_date", "image")
+
+CHILD_MODELS = (OtherName, Identifier, Contact, Link)
+
+
+def identifier_key(scheme, identifier):
+    # Schemes are typed by hand, "IC" and "ic" are the same one
+    return scheme.strip().lower(), identifier.strip()
+
+
+def load_features():
+    """
+    Everything pairs are scored on, per person id: (name keys, birth date, identifiers).
+    Plain tuples of strings, so they travel to worker processes cheaply.
+    """
+    keys = defaultdict(set)
+    for person_id, key in PersonNameKey.objects.values_list("person_id", "key").iterator():
+        keys[person_id.hex].add(key)
+
+    identifiers = defaultdict(set)
+    person_type = ContentType.objects.get_for_model(Person)
+    rows = Identifier._meta.translations_model.objects.filter(master__content_type=person_type).values_list(
+        "master__object_id", "scheme", "master__identifier"
+    )
+    for person_id, scheme, identifier in rows.iterator():
+        identifiers[person_id.hex].add(identifier_key(scheme, identifier))
+
+    features = {}
+    for person_id, birth_date in Person.objects.values_list("id", "birth_date").iterator():
+        person_id = person_id.hex
+        features[person_id] = (
+            tuple(sorted(keys.get(person_id, ()))),
+            (birth_date or "").strip(),
+            tuple(sorted(identifiers.get(person_id, ()))),
+        )
+    return features
+
+
+def candidate_pairs(features):
+    """
+    Pairs of person ids sharing at least one block, each pair once
+    """
+    blocks = defaultdict(set)
+    for person_id, (keys, birth_date, identifiers) in features.items():
+        for key in keys:
+            blocks[("name", key)].add(person_id)
+            if birth_date:
+                for word in key.split():
+                    blocks[("birth", birth_date, word)].add(person_id)
+        for scheme, identifier in identifiers:
+            blocks[("identifier", identifier)].add(person_id)
+
+    pairs = set()
+    for members in blocks.values():
+        if 1 < len(members) <= MAX_BLOCK_SIZE:
+            pairs.update(itertools.combinations(sorted(members), 2))
+    return pairs
+
+
+def score_pair(first, second):
+    """
+    How likely two persons are the same, between 0 and 1, with the reasons for it
+    """
+    first_keys, first_birth_date, first_identifiers = first
+    second_keys, second_birth_date, second_identifiers = second
+    reasons = []
+
+    name_score = 0.0
+    for first_key in first_keys:
+        for second_key in second_keys:
+            if first_key == second_key:
+                name_score = 1.0
+            else:
+                name_score = max(name_score, similarity(trigrams(first_key), trigrams(second_key)))
+    score = 0.6 * name_score
+    if name_score:
+        reasons.append("name %.2f" % name_score)
+
+    shared = set(first_identifiers) & set(second_identifiers)
+    if shared:
+        score += 0.3
+        reasons.append("identifier %s" % ", ".join("%s:%s" % pair for pair in sorted(shared)))
+    else:
+        first_schemes = dict(first_identifiers)
+        second_schemes = dict(second_identifiers)
+        conflicts = [scheme for scheme in first_schemes
+                     if scheme in second_schemes and first_schemes[scheme] != second_schemes[scheme]]
+        if conflicts:
+            score *= 0.5
+            reasons.append("different %s" % ", ".join(sorted(conflicts)))
+
+    if first_birth_date and second_birth_date:
+        if first_birth_date == second_birth_date:
+            score += 0.1
+            reasons.append("birth date")
+        else:
+            score *= 0.5
+            reasons.append("different birth date")
+
+    return min(score, 1.0), reasons
+
+
+def score_pairs(chunk):
+    """
+    Scores a list of ((first id, first features), (second id, second features)), run in worker processes
+    """
+    results = []
+    for (first_id, first), (second_id, second) in chunk:
+        score, reasons = score_pair(first, second)
+        results.append((first_id, second_id, score, reasons))
+    return results
+
+
+def find_duplicates(threshold, processes=None, features=None):
+    """
+    (first id, second id, score, reasons) of the pairs scoring at least threshold, best first.
+    Scoring is spread over processes workers, 1 scores in this process.
+    """
+    if features is None:
+        features = load_features()
+    pairs = sorted(candidate_pairs(features))
+    chunks = [
+        [((first, features[first]), (second, features[second])) for first, second in pairs[start:start + SCORE_CHUNK_SIZE]]
+        for start in range(0, len(pairs), SCORE_CHUNK_SIZE)
+    ]
+
+    if processes == 1 or len(chunks) <= 1:
+        scored = [score_pairs(chunk) for chunk in chunks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            scored = pool.map(score_pairs, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+    duplicates = [result for results in scored for result in results if result[2] >= threshold]
+    duplicates.sort(key=lambda result: (-result[2], result[0], result[1]))
+    return duplicates
+
+
+def identifier_keys(person_type, person_ids):
+    """
+    {identifier id: set of identifier_key} of the identifiers of person_ids, one key per translated scheme
+    """
+    rows = Identifier._meta.translations_model.objects.filter(
+        master__content_type=person_type, master__object_id__in=person_ids
+    ).values_list("master_id", "scheme", "master__identifier")
+    keys = defaultdict(set)
+    for identifier_id, scheme, identifier in rows:
+        keys[identifier_id].add(identifier_key(scheme, identifier))
+    return keys
+
+
+def drop_held_identifiers(person, duplicate_ids):
+    """
+    Deletes the identifiers of duplicates that person, or another duplicate, already holds, their links
+    going to the identifier that stays
+    """
+    person_type = ContentType.objects.get_for_model(Person)
+    held = {}
+    for identifier_id, keys in identifier_keys(person_type, [person.id]).items():
+        for key in keys:
+            held.setdefault(key, identifier_id)
+
+    dropped = {}
+    for identifier_id, keys in sorted(identifier_keys(person_type, duplicate_ids).items()):
+        kept = [held[key] for key in sorted(keys) if key in held]
+        if kept:
+            dropped[identifier_id] = kept[0]
+            continue
+        for key in keys:
+            held[key] = identifier_id
+    if not dropped:
+        return
+
+    identifier_type = ContentType.objects.get_for_model(Identifier)
+    for identifier_id, kept_id in dropped.items():
+        Link.objects.filter(content_type=identifier_type, object_id=identifier_id).update(object_id=kept_id)
+    Identifier.objects.untranslated().filter(id__in=list(dropped)).delete()
+
+
+def merge_persons(person, duplicates):
+    """
+    Folds duplicates into person: identifiers person already holds are dropped, every other child object is
+    moved over with one UPDATE per table, translations in languages person lacks are moved over, other names
+    in languages it has become other names, empty shared fields are filled, then duplicates are deleted.
+    """
+    duplicate_ids = [duplicate.id for duplicate in duplicates if duplicate.id != person.id]
+    if not duplicate_ids:
+        return person
+    person_type = ContentType.objects.get_for_model(Person)
+    translations = Person._meta.translations_model.objects
+
+    with deferred_person_changes(), transaction.atomic():
+        drop_held_identifiers(person, duplicate_ids)
+        for model in CHILD_MODELS:
+            model.objects.filter(content_type=person_type, object_id__in=duplicate_ids).update(object_id=person.id)
+
+        names = dict(translations.filter(master_id=person.id).values_list("language_code", "name"))
+        for duplicate_id in duplicate_ids:
+            duplicate_names = translations.filter(master_id=duplicate_id).values_list("language_code", "name")
+            for language_code, name in duplicate_names:
+                if language_code not in names:
+                    translations.filter(master_id=duplicate_id, language_code=language_code).update(master_id=person.id)
+                    names[language_code] = name
+                elif name != names[language_code]:
+                    # Both have a name in that language, the duplicate's is kept as an other name
+                    OtherName.objects.language(language_code).create(name=name, content_object=person)
+
+        values = {}
+        for duplicate in duplicates:
+            for field in MERGED_FIELDS:
+                if not getattr(person, field) and field not in values and getattr(duplicate, field):
+                    values[field] = getattr(duplicate, field)
+        values["updated_at"] = timezone.now()
+        Person.objects.filter(id=person.id).update(**values)
+        for field, value in values.items():
+            setattr(person, field, value)
+
+        Person.objects.filter(id__in=duplicate_ids).delete()
+
+        # Bulk updates send no signal of their own
+        person_changed.send(sender=Person, person_id=person.id, instance=person, action="updated")
+    return person
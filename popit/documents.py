@@ -0,0 +1,132 @@
+import json
+import multiprocessing
+import uuid
+from collections import OrderedDict
+from django.db import IntegrityError
+from django.db import connections
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import six
+from rest_framework.utils.encoders import JSONEncoder
+from popit import cache
+from popit.models import Person
+from popit.models import PersonDocument
+from popit.rendering import render_persons
+from popit.signals import persons_changed
+
+
+# Every person is kept rendered in each language of settings.LANGUAGES, so the list and detail endpoints
+# read one row per person instead of a person and all its relations. Documents are dropped whenever their
+# person changes and rendered again on the next read, or all at once by manage.py rebuild_documents.
+# A write may commit while a reader renders, so each document carries the version of its person it was
+# rendered from, and documents of an older version are read as missing.
+
+REBUILD_CHUNK_SIZE = 500
+
+
+def document_languages():
+    return cache.cached_languages()
+
+
+def dump(data):
+    return json.dumps(data, cls=JSONEncoder, separators=(",", ":"))
+
+
+def load(text):
+    return json.loads(text, object_pairs_hook=OrderedDict)
+
+
+def person_uuid(pk):
+    return pk if isinstance(pk, uuid.UUID) else uuid.UUID(six.text_type(pk))
+
+
+def person_versions(person_ids):
+    """
+    Version of each of person_ids, moved by every change once it is written, see Person.version.
+    Persons that do not exist are at 0.
+    """
+    versions = dict((person_id, 0) for person_id in person_ids)
+    versions.update(Person.objects.filter(id__in=person_ids).values_list("id", "version"))
+    return versions
+
+
+def rebuild_documents(person_ids, languages=None):
+    """
+    Renders and stores the documents of the given persons, in every document language by default.
+    Returns them as popit.rendering.render_persons does.
+    """
+    if languages is None:
+        languages = document_languages()
+    # Read before rendering, a write committed meanwhile leaves the documents behind
+    versions = person_versions(person_ids)
+    rendered = render_persons(person_ids, languages)
+    try:
+        with transaction.atomic():
+            PersonDocument.objects.filter(person_id__in=person_ids, language_code__in=languages).delete()
+            PersonDocument.objects.bulk_create(
+                PersonDocument(person_id=person_id, language_code=language, data=dump(data),
+                               version=versions[person_id])
+                for (person_id, language), data in rendered.items()
+            )
+    except IntegrityError:
+        # A concurrent request stored the same documents first
+        pass
+    return rendered
+
+
+def get_documents(person_ids, language):
+    """
+    Rendered persons in language keyed by person id, missing documents being rebuilt on the way.
+    Persons that do not exist are left out. Languages without documents are rendered every time.
+    """
+    person_ids = [person_uuid(pk) for pk in person_ids]
+    if language not in document_languages():
+        rendered = render_persons(person_ids, [language])
+        return dict((person_id, data) for (person_id, code), data in rendered.items())
+
+    versions = person_versions(person_ids)
+    rows = PersonDocument.objects.filter(person_id__in=person_ids, language_code=language)
+    documents = dict(
+        (person_id, load(data)) for person_id, data, version in rows.values_list("person_id", "data", "version")
+        if version == versions[person_id]
+    )
+    missing = [person_id for person_id in person_ids if person_id not in documents]
+    if missing:
+        rendered = rebuild_documents(missing, [language])
+        documents.update((person_id, data) for (person_id, code), data in rendered.items())
+    return documents
+
+
+def rebuild_chunk(person_ids):
+    rebuild_documents(person_ids)
+    return len(person_ids)
+
+
+def rebuild_all_documents(chunk_size=REBUILD_CHUNK_SIZE, processes=None):
+    """
+    Rebuilds the documents of every person, chunk_size persons at a time spread over processes workers,
+    1 works in this process. Yields the number of persons done after each chunk.
+    """
+    person_ids = list(Person.objects.order_by("id").values_list("id", flat=True))
+    chunks = [person_ids[start:start + chunk_size] for start in range(0, len(person_ids), chunk_size)]
+    if processes == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield rebuild_chunk(chunk)
+        return
+
+    # Workers would otherwise share the connection of this process, they open their own
+    for connection in connections.all():
+        connection.close()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for done in pool.imap_unordered(rebuild_chunk, chunks):
+            yield done
+    finally:
+        pool.close()
+        pool.join()
+
+
+@receiver(persons_changed, dispatch_uid="popit_documents_invalidate")
+def persons_changed_handler(sender, changes, **kwargs):
+    person_ids = set(person_id for person_id, instance, action in changes)
+    PersonDocument.objects.filter(person_id__in=person_ids).delete()
@@ -0,0 +1,53 @@
+from popit.models import Person
+from popit.rendering import render_persons
+from popit.renderers import dumps
+
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def iter_person_id_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Walk the id of every person in id order, chunk_size at a time. Each chunk is a fresh keyset query
+    so memory stays bounded by the chunk, not the dataset.
+    """
+    last_id = None
+    while True:
+        persons = Person.objects.order_by("id")
+        if last_id is not None:
+            persons = persons.filter(id__gt=last_id)
+        chunk = list(persons.values_list("id", flat=True)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def iter_rendered_persons(language, chunk_size=EXPORT_CHUNK_SIZE):
+    for chunk in iter_person_id_chunks(chunk_size):
+        rendered = render_persons(chunk, [language])
+        for person_id in chunk:
+            # Persons deleted since the chunk was read are left out
+            if (person_id, language) in rendered:
+                yield rendered[(person_id, language)]
+
+
+def iter_popolo_json(language, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield a popolo document, {"persons": [...]}, piece by piece.
+    """
+    yield '{"persons":['
+    separator = ""
+    for person in iter_rendered_persons(language, chunk_size):
+        yield separator + dumps(person)
+        separator = ","
+    yield ']}'
+
+
+def iter_popolo_ndjson(language, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield every person as a line of json
+    """
+    for person in iter_rendered_persons(language, chunk_size):
+        yield dumps(person) + "\n"
+
@@ -0,0 +1,68 @@
+from django.conf import settings
+from hvad.utils import get_cached_translation
+
+
+# A missing translation is served from the next language of the chain set in POPIT_LANGUAGE_FALLBACKS,
+# field by field, so a half translated person shows its english name next to its malay biography.
+
+UNTRANSLATED_FIELDS = ("id", "master", "language_code")
+
+
+def language_chain(language):
+    """
+    language followed by its fallbacks, without repetition
+    """
+    chain = [language]
+    for code in getattr(settings, "POPIT_LANGUAGE_FALLBACKS", {}).get(language, ()):
+        if code not in chain:
+            chain.append(code)
+    return chain
+
+
+def translated_field_names(model):
+    return [field.name for field in model._meta.translations_model._meta.fields if field.name not in UNTRANSLATED_FIELDS]
+
+
+def is_empty(value):
+    return value is None or value == ""
+
+
+def resolve_translation(instance, chain):
+    """
+    The translation of instance in the first language of chain it has, with empty fields taken from the
+    languages after it. Prefetched translations are used when there are some, otherwise the candidates
+    are fetched in one query. An empty translation in the first language when there is none at all.
+    """
+    trans_model = instance._meta.translations_model
+    names = translated_field_names(type(instance))
+
+    cached = get_cached_translation(instance)
+    if cached is not None and cached.language_code == chain[0]:
+        if len(chain) == 1 or not any(is_empty(getattr(cached, name)) for name in names):
+            return cached
+
+    accessor = getattr(instance, instance._meta.translations_accessor)
+    candidates = accessor.all()
+    if candidates._result_cache is None:
+        candidates = accessor.filter(language_code__in=chain)
+    by_language = dict((translation.language_code, translation) for translation in candidates)
+    found = [by_language[code] for code in chain if code in by_language]
+    if not found:
+        return trans_model(language_code=chain[0])
+
+    primary = found[0]
+    missing = [name for name in names if is_empty(getattr(primary, name))]
+    if len(found) == 1 or not missing:
+        return primary
+
+    # An unsaved copy, the stored translations are left alone
+    merged = trans_model(language_code=primary.language_code, master_id=primary.master_id)
+    for name in names:
+        value = getattr(primary, name)
+        if name in missing:
+            for fallback in found[1:]:
+                if not is_empty(getattr(fallback, name)):
+                    value = getattr(fallback, name)
+                    break
+        setattr(merged, name, value)
+    return merged
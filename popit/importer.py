@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+from django.db import IntegrityError
+from django.utils import six
+from popit.serializers import PersonSerializer
+
+
+READ_BUFFER_SIZE = 64 * 1024
+
+
+class PopoloReader(object):
+    """
+    Reads persons out of a popolo json document one at a time, without loading the whole file.
+    The document is either a list of persons or an object with a "persons" list. Other top level
+    collections of the document are skipped.
+    """
+
+    def __init__(self, stream, buffer_size=READ_BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.buffer = u""
+        self.pos = 0
+        self.exhausted = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        if self.exhausted:
+            return False
+        data = self.stream.read(self.buffer_size)
+        if not data:
+            self.exhausted = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return u""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected %r at position %d" % (char, self.pos))
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer could be cut short
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        self.expect(u"[")
+        if self.peek() == u"]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.peek() == u",":
+                self.pos += 1
+                continue
+            self.expect(u"]")
+            return
+
+    def __iter__(self):
+        if self.peek() == u"[":
+            for item in self.iter_array():
+                yield item
+            return
+
+        self.expect(u"{")
+        while self.peek() != u"}":
+            key = self.decode()
+            self.expect(u":")
+            if key == u"persons":
+                for item in self.iter_array():
+                    yield item
+            else:
+                self.decode()
+            if self.peek() == u",":
+                self.pos += 1
+
+
+def csv_row_to_person(row):
+    """
+    Maps a spreadsheet row onto the data PersonSerializer expects.
+    Columns named after person fields are copied as they are, and for the nested fields:
+        identifier:<scheme>  an identifier in that scheme
+        contact:<type>       a contact of that type
+        other_names          other names separated by ;
+        links                urls separated by ;
+    Empty cells are left out.
+    """
+    person = {}
+    identifiers = []
+    contacts = []
+    other_names = []
+    links = []
+    for column, value in row.items():
+        if column is None or value is None:
+            continue
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        if isinstance(column, bytes):
+            column = column.decode("utf-8")
+        column = column.strip()
+        value = value.strip()
+        if not value:
+            continue
+        if column.startswith(u"identifier:"):
+            identifiers.append({"scheme": column.split(u":", 1)[1], "identifier": value})
+        elif column.startswith(u"contact:"):
+            contacts.append({"type": column.split(u":", 1)[1], "value": value})
+        elif column == u"other_names":
+            other_names.extend({"name": name.strip()} for name in value.split(u";") if name.strip())
+        elif column == u"links":
+            links.extend({"url": url.strip()} for url in value.split(u";") if url.strip())
+        else:
+            person[column] = value
+    person["identifiers"] = identifiers
+    person["contacts"] = contacts
+    person["other_names"] = other_names
+    person["links"] = links
+    return person
+
+
+def iter_csv_persons(path):
+    if six.PY2:
+        stream = open(path, "rb")
+    else:
+        stream = io.open(path, encoding="utf-8", newline="")
+    with stream:
+        for row in csv.DictReader(stream):
+            yield csv_row_to_person(row)
+
+
+def strip_language_code(data):
+    """
+    Exported documents carry the language_code of each translated object, which serializers that
+    enforce a language refuse. The language is given to the import instead.
+    """
+    data.pop("language_code", None)
+    for value in data.values():
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    strip_language_code(item)
+    return data
+
+
+def iter_json_persons(path):
+    with io.open(path, encoding="utf-8") as stream:
+        for person in PopoloReader(stream):
+            yield strip_language_code(person)
+
+
+def import_persons(persons, language, chunk_size):
+    """
+    Validates and bulk creates persons chunk_size at a time, each chunk in its own transaction.
+    Yields (number of persons read, number created, errors) after each chunk, errors being a list of
+    (position in persons, error) for the invalid ones, which are left out.
+    """
+    position = 0
+    chunk = []
+    for person in persons:
+        chunk.append(person)
+        if len(chunk) == chunk_size:
+            created, errors = _import_chunk(chunk, position, language)
+            position += len(chunk)
+            chunk = []
+            yield position, created, errors
+    if chunk:
+        created, errors = _import_chunk(chunk, position, language)
+        position += len(chunk)
+        yield position, created, errors
+
+
+def _import_chunk(chunk, offset, language):
+    try:
+        return _save_chunk(chunk, offset, language)
+    except IntegrityError:
+        # Validation passed but a row clashed with the database, saving persons one at a time finds which
+        created = 0
+        errors = []
+        for i, person in enumerate(chunk):
+            try:
+                person_created, person_errors = _save_chunk([person], offset + i, language)
+            except IntegrityError as error:
+                person_created, person_errors = 0, [(offset + i, {"non_field_errors": [six.text_type(error)]})]
+            created += person_created
+            errors.extend(person_errors)
+        return created, errors
+
+
+def _save_chunk(chunk, offset, language):
+    serializer = PersonSerializer(data=chunk, many=True, language=language)
+    if serializer.is_valid():
+        serializer.save()
+        return len(chunk), []
+
+    errors = [(offset + i, error) for i, error in enumerate(serializer.errors) if error]
+    valid = [person for person, error in zip(chunk, serializer.errors) if not error]
+    if valid:
+        serializer = PersonSerializer(data=valid, many=True, language=language)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    return len(valid), errors
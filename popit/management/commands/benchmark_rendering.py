@@ -0,0 +1,66 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from rest_framework.utils.encoders import JSONEncoder
+from popit.fallbacks import language_chain
+from popit.models import Person
+from popit.rendering import render_persons
+from popit.serializers import PersonSerializer
+
+
+def serializer_render(person_ids, language):
+    persons = list(PersonSerializer.setup_eager_loading(
+        Person.objects.untranslated().filter(id__in=person_ids), languages=language_chain(language)
+    ))
+    data = PersonSerializer(persons, many=True, language=language).data
+    return dict(((person.id, language), item) for person, item in zip(persons, data))
+
+
+def fast_render(person_ids, language):
+    return render_persons(person_ids, [language])
+
+
+class Command(BaseCommand):
+    help = "Time rendering persons through PersonSerializer and through popit.rendering, queries included"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--persons", type=int, default=200, help="How many persons are rendered at once")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs of each, the best one is reported")
+        parser.add_argument("--language", default="en")
+
+    def best_time(self, render, person_ids, language, repeat):
+        best = None
+        for i in range(repeat):
+            start = time.time()
+            rendered = render(person_ids, language)
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, rendered
+
+    def handle(self, *args, **options):
+        if options["persons"] <= 0 or options["repeat"] <= 0:
+            raise CommandError("--persons and --repeat must be positive")
+        language = options["language"]
+        person_ids = list(Person.objects.order_by("id").values_list("id", flat=True)[:options["persons"]])
+        if not person_ids:
+            raise CommandError("There is no person to render")
+
+        results = []
+        for name, render in (("serializer", serializer_render), ("fast path", fast_render)):
+            elapsed, rendered = self.best_time(render, person_ids, language, options["repeat"])
+            results.append((name, elapsed, rendered))
+            self.stdout.write("%-10s %8.3f ms per person, %8.1f ms for %d persons" % (
+                name, elapsed * 1000 / len(person_ids), elapsed * 1000, len(person_ids)
+            ))
+
+        serializer_time, fast_time = results[0][1], results[1][1]
+        if fast_time:
+            self.stdout.write("speedup    %8.2fx" % (serializer_time / fast_time))
+        expected, rendered = results[0][2], results[1][2]
+        identical = set(expected) == set(rendered) and all(
+            json.dumps(expected[key], cls=JSONEncoder) == json.dumps(rendered[key], cls=JSONEncoder) for key in expected
+        )
+        if not identical:
+            raise CommandError("The fast path did not render what the serializer does")
+        self.stdout.write("Output is identical")
@@ -0,0 +1,31 @@
+import csv
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from popit.dedupe import find_duplicates
+
+
+class Command(BaseCommand):
+    help = "Report likely duplicate persons as csv, best match first. Run rebuild_name_keys first on data loaded without signals"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold", type=float, default=0.7, help="Lowest score reported, between 0 and 1")
+        parser.add_argument("--processes", type=int, default=None,
+                            help="Worker processes scoring pairs, default to the number of cpus")
+        parser.add_argument("--output", help="Report file, default to stdout")
+
+    def handle(self, *args, **options):
+        if options["processes"] is not None and options["processes"] <= 0:
+            raise CommandError("--processes must be positive")
+        duplicates = find_duplicates(options["threshold"], processes=options["processes"])
+
+        output = open(options["output"], "w") if options["output"] else self.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(["person", "duplicate", "score", "reasons"])
+            for first_id, second_id, score, reasons in duplicates:
+                writer.writerow([first_id, second_id, "%.3f" % score, "; ".join(reasons)])
+        finally:
+            if options["output"]:
+                output.close()
+        if options["output"]:
+            self.stdout.write("%d likely duplicates written to %s" % (len(duplicates), options["output"]))
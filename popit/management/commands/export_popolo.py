@@ -0,0 +1,29 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from popit.export import iter_popolo_json
+from popit.export import EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Export every person as a popolo json document, one file per language"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir")
+        parser.add_argument("--language", action="append", dest="languages",
+                            help="Language to export, can be repeated. Default to every language in settings")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, dest="chunk_size")
+
+    def handle(self, *args, **options):
+        output_dir = options["output_dir"]
+        if not os.path.isdir(output_dir):
+            raise CommandError("%s is not a directory" % output_dir)
+        languages = options["languages"] or [code for code, name in settings.LANGUAGES]
+
+        for language in languages:
+            path = os.path.join(output_dir, "persons.%s.json" % language)
+            with open(path, "w") as output:
+                for piece in iter_popolo_json(language, chunk_size=options["chunk_size"]):
+                    output.write(piece)
+            self.stdout.write("Exported %s" % path)
@@ -0,0 +1,71 @@
+import itertools
+import json
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from rest_framework.utils.encoders import JSONEncoder
+from popit.importer import import_persons
+from popit.importer import iter_csv_persons
+from popit.importer import iter_json_persons
+
+
+class Command(BaseCommand):
+    help = "Import persons from a popolo json document or a csv file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--language", default="en", help="Language of the translated fields in the file")
+        parser.add_argument("--format", choices=("json", "csv"), dest="file_format",
+                            help="Default to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=500, dest="chunk_size",
+                            help="Persons written per transaction")
+        parser.add_argument("--skip", type=int, default=0, help="Number of persons to skip from the start of the file")
+        parser.add_argument("--state-file", dest="state_file",
+                            help="Keeps the number of persons already processed, to resume an interrupted import")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError("%s does not exist" % path)
+        file_format = options["file_format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format == "json":
+            persons = iter_json_persons(path)
+        elif file_format == "csv":
+            persons = iter_csv_persons(path)
+        else:
+            raise CommandError("Unknown format %s, use --format" % file_format)
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive")
+
+        skip = options["skip"]
+        state_file = options["state_file"]
+        if state_file and os.path.exists(state_file):
+            with open(state_file) as state:
+                skip = int(state.read().strip() or 0)
+            self.stdout.write("Resuming after %d persons" % skip)
+        persons = itertools.islice(persons, skip, None)
+
+        start = time.time()
+        total_created = 0
+        total_errors = 0
+        processed = skip
+        for read, created, errors in import_persons(persons, options["language"], options["chunk_size"]):
+            processed = skip + read
+            total_created += created
+            total_errors += len(errors)
+            for position, error in errors:
+                # Messages are lazy translations, written as they read
+                self.stderr.write("Person %d: %s" % (skip + position, json.dumps(error, cls=JSONEncoder)))
+            if state_file:
+                with open(state_file, "w") as state:
+                    state.write(str(processed))
+            elapsed = time.time() - start
+            self.stdout.write("%d persons processed, %d created, %.1f persons/s" % (
+                processed, total_created, (processed - skip) / elapsed if elapsed else 0
+            ))
+
+        elapsed = time.time() - start
+        self.stdout.write("Done: %d created, %d rejected in %.1fs (%.1f persons/s)" % (
+            total_created, total_errors, elapsed, (processed - skip) / elapsed if elapsed else 0
+        ))
@@ -0,0 +1,28 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from popit.dedupe import merge_persons
+from popit.models import Person
+
+
+class Command(BaseCommand):
+    help = "Merge duplicate persons into the first one given"
+
+    def add_arguments(self, parser):
+        parser.add_argument("person")
+        parser.add_argument("duplicates", nargs="+")
+
+    def handle(self, *args, **options):
+        ids = [options["person"]] + options["duplicates"]
+        try:
+            persons = dict((person.id.hex, person) for person in Person.objects.filter(id__in=ids))
+        except (ValueError, ValidationError) as error:
+            raise CommandError(str(error))
+        missing = [pk for pk in ids if pk.replace("-", "").lower() not in persons]
+        if missing:
+            raise CommandError("No person with id %s" % ", ".join(missing))
+
+        person = persons[options["person"].replace("-", "").lower()]
+        duplicates = [persons[pk.replace("-", "").lower()] for pk in options["duplicates"]]
+        merge_persons(person, duplicates)
+        self.stdout.write("Merged %d persons into %s" % (len(duplicates), person.id))
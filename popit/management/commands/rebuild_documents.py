@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from popit.documents import REBUILD_CHUNK_SIZE
+from popit.documents import rebuild_all_documents
+
+
+class Command(BaseCommand):
+    help = "Render the stored document of every person in every language again, for data loaded without signals"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=REBUILD_CHUNK_SIZE, dest="chunk_size")
+        parser.add_argument("--processes", type=int, default=None,
+                            help="Worker processes rendering chunks, default to the number of cpus")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive")
+        if options["processes"] is not None and options["processes"] <= 0:
+            raise CommandError("--processes must be positive")
+        total = 0
+        for done in rebuild_all_documents(options["chunk_size"], options["processes"]):
+            total += done
+            if options["verbosity"] > 1:
+                self.stdout.write("%d persons done" % total)
+        self.stdout.write("Rebuilt documents of %d persons" % total)
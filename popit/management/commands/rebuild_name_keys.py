@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from popit.matching import rebuild_name_keys
+from popit.models import Person
+
+
+class Command(BaseCommand):
+    help = "Recompute the name matching keys of every person, for data loaded without signals"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, dest="chunk_size")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        person_ids = list(Person.objects.values_list("id", flat=True).order_by("id"))
+        for start in range(0, len(person_ids), chunk_size):
+            rebuild_name_keys(person_ids[start:start + chunk_size])
+        self.stdout.write("Rebuilt name keys of %d persons" % len(person_ids))
@@ -0,0 +1,221 @@
+import re
+import unicodedata
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count
+from django.dispatch import receiver
+from django.utils import six
+from popit.models import OtherName
+from popit.models import Person
+from popit.models import PersonNameKey
+from popit.models import PersonNameTrigram
+from popit.signals import persons_changed
+
+
+# Name matching runs on keys precomputed for every name and other name of a person, in every language.
+# A key is the name folded to lower case ascii where possible, without honorifics or patronymic
+# connectors, with common romanisation variants unified and its words sorted. "Dato' Sri Mohd. Najib bin
+# Tun Abdul Razak" and "Najib Razak, Muhammad" end up close together. Scripts without a latin form are
+# kept as they are and only match names written in the same script.
+
+HONORIFICS = (
+    "yang amat berhormat", "yang berhormat", "yang berbahagia", "yang mulia",
+    "datuk seri", "datuk sri", "dato seri", "dato sri", "tan sri", "puan sri", "toh puan",
+    "tun", "datuk", "dato", "datin", "tunku", "tengku", "raja", "haji", "hajah", "hj", "hjh",
+    "yab", "yb", "ybhg", "dr", "prof", "ir", "tuan", "puan", "encik", "en", "cik", "mr", "mrs", "ms",
+    "mdm", "madam", "sir",
+)
+
+# Patronymic connectors, "a/l" and friends are rewritten to a single word first
+CONNECTORS = frozenset(["bin", "binti", "binte", "bte", "bt", "anak", "al", "ap", "so", "do"])
+CONNECTOR_PATTERN = re.compile(r"\b([asd])\s*/\s*([lpo])\b")
+
+VARIANTS = {
+    "mohd": "muhammad",
+    "mohamad": "muhammad",
+    "mohammad": "muhammad",
+    "mohamed": "muhammad",
+    "mohammed": "muhammad",
+    "muhamad": "muhammad",
+    "muhammed": "muhammad",
+    "muhd": "muhammad",
+    "md": "muhammad",
+    "abd": "abdul",
+    "abdol": "abdul",
+    "nurul": "nur",
+    "noor": "nur",
+    "nor": "nur",
+}
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Candidates looked at in detail for each query, and the similarity below which they are dropped
+CANDIDATE_LIMIT = 200
+MATCH_THRESHOLD = 0.4
+
+
+def fold(text):
+    """
+    Lower case, with accents dropped and apostrophes removed so "Dato'" and "Dato" are the same word.
+    """
+    text = unicodedata.normalize("NFKD", six.text_type(text).lower())
+    text = u"".join(char for char in text if not unicodedata.combining(char))
+    return text.replace(u"'", u"").replace(u"\u2019", u"").replace(u"`", u"")
+
+
+def tokenize(text):
+    return WORD_PATTERN.findall(CONNECTOR_PATTERN.sub(r"\1\2", fold(text)))
+
+
+def _honorific_phrases(extra):
+    phrases = [tuple(honorific.split()) for honorific in HONORIFICS]
+    for honorific in extra:
+        if honorific:
+            words = tuple(tokenize(honorific))
+            if words:
+                phrases.append(words)
+    # Longest first, so "datuk seri" goes before "datuk" leaves "seri" behind
+    return sorted(set(phrases), key=len, reverse=True)
+
+
+def name_key(name, honorifics=()):
+    """
+    The key of name, honorifics being the honorific prefix and suffix recorded with it
+    """
+    if not name:
+        return u""
+    words = tokenize(name)
+    phrases = _honorific_phrases(honorifics)
+    kept = []
+    position = 0
+    while position < len(words):
+        for phrase in phrases:
+            if tuple(words[position:position + len(phrase)]) == phrase:
+                position += len(phrase)
+                break
+        else:
+            word = words[position]
+            if word not in CONNECTORS:
+                kept.append(VARIANTS.get(word, word))
+            position += 1
+    return u" ".join(sorted(kept))[:255]
+
+
+def trigrams(key):
+    """
+    Trigrams of every word of key, padded the way pg_trgm does it
+    """
+    result = set()
+    for word in key.split():
+        padded = u"  %s " % word
+        for position in range(len(padded) - 2):
+            result.add(padded[position:position + 3])
+    return result
+
+
+def similarity(first, second):
+    if not first or not second:
+        return 0.0
+    return float(len(first & second)) / len(first | second)
+
+
+def person_name_keys(person_ids):
+    """
+    Keys of every name of the given persons, as a dict of person id to a set of keys
+    """
+    keys = defaultdict(set)
+    person_names = Person._meta.translations_model.objects.filter(master_id__in=person_ids).values_list(
+        "master_id", "name", "given_name", "family_name", "honorific_prefix", "honorific_suffix"
+    )
+    other_names = OtherName._meta.translations_model.objects.filter(
+        master__content_type=ContentType.objects.get_for_model(Person), master__object_id__in=person_ids
+    ).values_list(
+        "master__object_id", "name", "given_name", "family_name", "honorific_prefix", "honorific_suffix"
+    )
+    for names in (person_names, other_names):
+        for person_id, name, given_name, family_name, prefix, suffix in names:
+            honorifics = (prefix, suffix)
+            keys[person_id].add(name_key(name, honorifics))
+            if given_name and family_name:
+                keys[person_id].add(name_key(u"%s %s" % (given_name, family_name), honorifics))
+    for person_keys in keys.values():
+        person_keys.discard(u"")
+    return keys
+
+
+def rebuild_name_keys(person_ids):
+    """
+    Recompute the keys and trigrams of the given persons. Persons that do not exist anymore lose theirs.
+    """
+    person_ids = list(person_ids)
+    existing = set(Person.objects.filter(id__in=person_ids).values_list("id", flat=True))
+    keys = person_name_keys(existing)
+    with transaction.atomic():
+        PersonNameKey.objects.filter(person_id__in=person_ids).delete()
+        PersonNameTrigram.objects.filter(person_id__in=person_ids).delete()
+        PersonNameKey.objects.bulk_create(
+            PersonNameKey(person_id=person_id, key=key)
+            for person_id in existing for key in keys.get(person_id, ())
+        )
+        PersonNameTrigram.objects.bulk_create(
+            PersonNameTrigram(person_id=person_id, trigram=trigram)
+            for person_id in existing
+            for trigram in set().union(*[trigrams(key) for key in keys.get(person_id, ())])
+        )
+
+
+def match_keys(keys, exclude=None, limit=10, threshold=MATCH_THRESHOLD):
+    """
+    (person id, score) of the persons whose names are closest to any of keys, best first.
+    A score is the trigram similarity of the two closest names, 1.0 for the same key.
+    """
+    keys = set(key for key in keys if key)
+    query_trigrams = dict((key, trigrams(key)) for key in keys)
+    all_trigrams = set().union(*query_trigrams.values()) if keys else set()
+    if not all_trigrams:
+        return []
+
+    candidates = PersonNameTrigram.objects.filter(trigram__in=all_trigrams)
+    exact = PersonNameKey.objects.filter(key__in=keys)
+    if exclude is not None:
+        candidates = candidates.exclude(person_id=exclude)
+        exact = exact.exclude(person_id=exclude)
+    candidates = candidates.values("person_id").annotate(shared=Count("id")).order_by("-shared")
+    candidate_ids = set(row["person_id"] for row in candidates[:CANDIDATE_LIMIT])
+    candidate_ids.update(exact.values_list("person_id", flat=True))
+
+    scores = {}
+    for person_id, key in PersonNameKey.objects.filter(person_id__in=candidate_ids).values_list("person_id", "key"):
+        if key in keys:
+            score = 1.0
+        else:
+            candidate_trigrams = trigrams(key)
+            score = max(similarity(candidate_trigrams, query) for query in query_trigrams.values())
+        if score >= threshold and score > scores.get(person_id, 0.0):
+            scores[person_id] = score
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+    return ranked[:limit]
+
+
+def match_name(name, limit=10, threshold=MATCH_THRESHOLD):
+    return match_keys([name_key(name)], limit=limit, threshold=threshold)
+
+
+def match_person(person_id, limit=10, threshold=MATCH_THRESHOLD):
+    """
+    Likely duplicates of an existing person, from its own keys
+    """
+    keys = PersonNameKey.objects.filter(person_id=person_id).values_list("key", flat=True)
+    return match_keys(keys, exclude=person_id, limit=limit, threshold=threshold)
+
+
+# Only names feed the keys, identifiers, contacts and links do not change them
+NAME_MODELS = (Person, Person._meta.translations_model, OtherName, OtherName._meta.translations_model)
+
+
+@receiver(persons_changed, dispatch_uid="popit_matching_rebuild")
+def persons_changed_handler(sender, changes, **kwargs):
+    person_ids = set(person_id for person_id, instance, action in changes if isinstance(instance, NAME_MODELS))
+    if person_ids:
+        rebuild_name_keys(person_ids)
@@ -0,0 +1,134 @@
+from django.http import HttpResponse
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from django.utils.text import compress_string
+from popit import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Responses of views with cache_responses set are kept rendered in POPIT_CACHE, raw and compressed, and
+# served in the best encoding the client accepts without rendering nor compressing them again. They are
+# cached per generation of popit.cache, which every person write ends.
+
+# The browsable api varies per user and is not kept
+CACHED_CONTENT_TYPES = ("application/json", "application/x-ndjson", "application/msgpack")
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link", "Vary", "Allow")
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESSED_LENGTH = 200
+
+# Preferred first
+ENCODINGS = ("br", "gzip")
+
+
+def encode_variants(content):
+    variants = {"identity": content}
+    if len(content) >= MIN_COMPRESSED_LENGTH:
+        variants["gzip"] = compress_string(content)
+        if brotli is not None:
+            variants["br"] = brotli.compress(content)
+    return variants
+
+
+def accepted_encodings(header):
+    """
+    Encodings of an Accept-Encoding header that are not refused with q=0
+    """
+    accepted = set()
+    for item in header.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(parts[0].lower())
+    return accepted
+
+
+def best_encoding(variants, header):
+    accepted = accepted_encodings(header)
+    for encoding in ENCODINGS:
+        if encoding in variants and (encoding in accepted or "*" in accepted):
+            if len(variants[encoding]) < len(variants["identity"]):
+                return encoding
+    return "identity"
+
+
+def apply_variant(request, response, variants):
+    encoding = best_encoding(variants, request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    response.content = variants[encoding]
+    if encoding != "identity":
+        response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(response.content))
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def not_modified(request, headers):
+    etag = headers.get("ETag")
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        return etag is not None and (if_none_match.strip() == "*" or etag in [
+            value.strip() for value in if_none_match.split(",")
+        ])
+    last_modified = parse_http_date_safe(headers.get("Last-Modified", ""))
+    if_modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return last_modified is not None and if_modified_since is not None and last_modified <= if_modified_since
+
+
+class CompressedResponseCacheMiddleware(object):
+    """
+    Serves GET and HEAD of views that opt in from the response cache. A view opts in by setting the class
+    attribute cache_responses = True, only do so for responses that depend on nothing but the request and
+    the persons, as any person write is what ends their generation.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        if not getattr(getattr(view_func, "cls", None), "cache_responses", False):
+            return None
+        # Read before the view renders, so a write meanwhile leaves the response in a stale generation
+        key = cache.response_key(cache.responses_generation(), request)
+        entry = cache.get_cache().get(key)
+        if entry is None:
+            # Stored once rendered, by process_response
+            request._popit_response_key = key
+            return None
+
+        headers = dict(entry["headers"])
+        if not_modified(request, headers):
+            response = HttpResponseNotModified()
+            for name in ("ETag", "Last-Modified"):
+                if name in headers:
+                    response[name] = headers[name]
+            return response
+        response = HttpResponse()
+        for name, value in entry["headers"]:
+            response[name] = value
+        return apply_variant(request, response, entry["variants"])
+
+    def process_response(self, request, response):
+        key = getattr(request, "_popit_response_key", None)
+        if key is None or response.status_code != 200 or response.streaming or response.has_header("Content-Encoding"):
+            return response
+        if response.get("Content-Type", "").split(";")[0].strip() not in CACHED_CONTENT_TYPES:
+            return response
+
+        entry = {
+            "headers": [(name, response[name]) for name in KEPT_HEADERS if response.has_header(name)],
+            "variants": encode_variants(response.content),
+        }
+        cache.get_cache().set(key, entry, cache.cache_timeout())
+        return apply_variant(request, response, entry["variants"])
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0022_auto_20151009_0155'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated at'),
+        ),
+        migrations.AlterField(
+            model_name='identifier',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated at'),
+        ),
+        migrations.AlterField(
+            model_name='link',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated at'),
+        ),
+        migrations.AlterField(
+            model_name='othername',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='updated at'),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0023_updated_at_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='contact',
+            index_together=set([('content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='identifier',
+            index_together=set([('content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='link',
+            index_together=set([('content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='othername',
+            index_together=set([('content_type', 'object_id')]),
+        ),
+    ]
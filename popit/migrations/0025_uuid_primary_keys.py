@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+import sys
+import uuid
+from django.db import models, migrations
+
+
+# Ids were uuid4 strings, some with dashes and some without, repeated in object_id of every child
+# and in master_id of every translation. They become native uuid columns.
+SHARED_MODELS = ("Person", "Link", "Contact", "Identifier", "OtherName")
+CHILD_MODELS = ("Link", "Contact", "Identifier", "OtherName")
+
+# Any string was accepted as an id, only these forms convert as they are on every backend
+VALID_ID = re.compile(r"^([0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})$", re.I)
+UUID_DIGITS = re.compile(r"^[0-9a-f]{32}$", re.I)
+
+
+def columns_to_convert(apps):
+    """
+    (model, column) pairs holding a uuid, translation master columns included
+    """
+    columns = []
+    for name in SHARED_MODELS:
+        model = apps.get_model("popit", name)
+        columns.append((model, "id"))
+        columns.append((apps.get_model("popit", "%sTranslation" % name), "master_id"))
+    for name in CHILD_MODELS:
+        columns.append((apps.get_model("popit", name), "object_id"))
+    return columns
+
+
+def replacement_id(value):
+    # A uuid with dashes in odd places keeps its value, anything else gets a new one
+    digits = value.replace("-", "")
+    if UUID_DIGITS.match(digits):
+        return digits.lower()
+    return uuid.uuid4().hex
+
+
+def invalid_values(cursor, quote, model, column):
+    cursor.execute("SELECT DISTINCT %s FROM %s" % (quote(column), quote(model._meta.db_table)))
+    return [row[0] for row in cursor.fetchall() if row[0] is not None and not VALID_ID.match(row[0])]
+
+
+def replace_invalid_ids(apps, schema_editor):
+    """
+    Gives every id that is not a uuid a new one, along with the master_id of its translations and the
+    object_id of its children. Runs before any column is converted, with foreign keys out of the way.
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    cursor = schema_editor.connection.cursor()
+    quote = schema_editor.quote_name
+
+    def replace(model, column, old, new, content_type=None):
+        sql = "UPDATE %s SET %s = %%s WHERE %s = %%s" % (quote(model._meta.db_table), quote(column), quote(column))
+        params = [new, old]
+        if content_type is not None:
+            sql += " AND %s = %%s" % quote("content_type_id")
+            params.append(content_type.id)
+        cursor.execute(sql, params)
+
+    for name in SHARED_MODELS:
+        model = apps.get_model("popit", name)
+        translation_model = apps.get_model("popit", "%sTranslation" % name)
+        content_type = ContentType.objects.using(schema_editor.connection.alias).filter(
+            app_label="popit", model=name.lower()
+        ).first()
+        for old in invalid_values(cursor, quote, model, "id"):
+            new = replacement_id(old)
+            sys.stdout.write("\n  %s id %r is not a uuid, replaced with %s" % (name, old, new))
+            replace(model, "id", old, new)
+            replace(translation_model, "master_id", old, new)
+            if content_type is not None:
+                for child in CHILD_MODELS:
+                    replace(apps.get_model("popit", child), "object_id", old, new, content_type)
+
+    # Whatever is left points to no row, it only needs to convert
+    for model, column in columns_to_convert(apps):
+        for old in invalid_values(cursor, quote, model, column):
+            replace(model, column, old, replacement_id(old))
+
+
+def convert_postgresql(apps, schema_editor):
+    # Django 1.8 alters the column type without a USING clause and keeps the varchar_pattern_ops
+    # index of the old column, postgres accepts neither, so the conversion is done by hand.
+    columns = columns_to_convert(apps)
+    translations = [apps.get_model("popit", "%sTranslation" % name) for name in SHARED_MODELS]
+    quote = schema_editor.quote_name
+
+    for model in translations:
+        for name in schema_editor._constraint_names(model, ["master_id"], foreign_key=True):
+            schema_editor.execute(schema_editor.sql_delete_fk % {"table": quote(model._meta.db_table), "name": quote(name)})
+    replace_invalid_ids(apps, schema_editor)
+
+    for model, column in columns:
+        for name in schema_editor._constraint_names(model, [column], index=True):
+            if name.endswith("_like"):
+                schema_editor.execute(schema_editor.sql_delete_index % {"table": quote(model._meta.db_table), "name": quote(name)})
+        schema_editor.execute("ALTER TABLE %(table)s ALTER COLUMN %(column)s TYPE uuid USING %(column)s::uuid" % {
+            "table": quote(model._meta.db_table),
+            "column": quote(column),
+        })
+
+    for model in translations:
+        field = model._meta.get_field("master")
+        schema_editor.execute(schema_editor._create_fk_sql(model, field, "_fk_%(to_table)s_%(to_column)s"))
+
+
+def convert_other(apps, schema_editor):
+    # Backends without a uuid type store 32 hex characters, strip the dashes so lookups match
+    quote = schema_editor.quote_name
+    connection = schema_editor.connection
+    # Ids are replaced in the masters before their translations
+    checks_disabled = connection.disable_constraint_checking()
+    try:
+        replace_invalid_ids(apps, schema_editor)
+    finally:
+        if checks_disabled:
+            connection.enable_constraint_checking()
+    for model, column in columns_to_convert(apps):
+        schema_editor.execute("UPDATE %(table)s SET %(column)s = LOWER(REPLACE(%(column)s, '-', ''))" % {
+            "table": quote(model._meta.db_table),
+            "column": quote(column),
+        })
+
+    for name in SHARED_MODELS:
+        model = apps.get_model("popit", name)
+        new_field = models.UUIDField(serialize=False, primary_key=True, blank=True)
+        new_field.set_attributes_from_name("id")
+        new_field.model = model
+        schema_editor.alter_field(model, model._meta.get_field("id"), new_field)
+    for name in CHILD_MODELS:
+        model = apps.get_model("popit", name)
+        new_field = models.UUIDField()
+        new_field.set_attributes_from_name("object_id")
+        new_field.model = model
+        schema_editor.alter_field(model, model._meta.get_field("object_id"), new_field)
+
+
+def convert_ids(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        convert_postgresql(apps, schema_editor)
+    else:
+        convert_other(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0024_generic_relation_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(convert_ids),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='contact',
+                    name='id',
+                    field=models.UUIDField(serialize=False, primary_key=True, blank=True),
+                ),
+                migrations.AlterField(
+                    model_name='contact',
+                    name='object_id',
+                    field=models.UUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='identifier',
+                    name='id',
+                    field=models.UUIDField(serialize=False, primary_key=True, blank=True),
+                ),
+                migrations.AlterField(
+                    model_name='identifier',
+                    name='object_id',
+                    field=models.UUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='link',
+                    name='id',
+                    field=models.UUIDField(serialize=False, primary_key=True, blank=True),
+                ),
+                migrations.AlterField(
+                    model_name='link',
+                    name='object_id',
+                    field=models.UUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='othername',
+                    name='id',
+                    field=models.UUIDField(serialize=False, primary_key=True, blank=True),
+                ),
+                migrations.AlterField(
+                    model_name='othername',
+                    name='object_id',
+                    field=models.UUIDField(),
+                ),
+                migrations.AlterField(
+                    model_name='person',
+                    name='id',
+                    field=models.UUIDField(serialize=False, primary_key=True, blank=True),
+                ),
+            ],
+        ),
+    ]
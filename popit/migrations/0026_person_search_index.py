@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+# Full text indexes behind popit.search, postgres only. The expressions must match the ones in popit/search.py
+INDEXES = (
+    ("popit_person_translation_search", "popit_person_translation",
+     "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(given_name, '') || ' ' || coalesce(family_name, ''))"),
+    ("popit_othername_translation_search", "popit_othername_translation",
+     "to_tsvector('simple', coalesce(name, ''))"),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, expression in INDEXES:
+        schema_editor.execute("CREATE INDEX %s ON %s USING gin((%s))" % (name, table, expression))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, expression in INDEXES:
+        schema_editor.execute("DROP INDEX IF EXISTS %s" % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0025_uuid_primary_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0026_person_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonNameKey',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('key', models.CharField(max_length=255, db_index=True)),
+                ('person', models.ForeignKey(related_name='name_keys', to='popit.Person')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PersonNameTrigram',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('trigram', models.CharField(max_length=3)),
+                ('person', models.ForeignKey(related_name='name_trigrams', to='popit.Person')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='personnametrigram',
+            unique_together=set([('trigram', 'person')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='personnamekey',
+            unique_together=set([('person', 'key')]),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0027_person_name_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='identifier',
+            name='identifier',
+            field=models.CharField(max_length=255, verbose_name='identifier', db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='identifiertranslation',
+            name='scheme',
+            field=models.CharField(max_length=255, verbose_name='scheme', db_index=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0028_identifier_lookup_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonChange',
+            fields=[
+                ('id', models.AutoField(serialize=False, primary_key=True)),
+                ('person_id', models.UUIDField(verbose_name='person', db_index=True)),
+                ('model', models.CharField(max_length=20, verbose_name='model')),
+                ('object_id', models.UUIDField(verbose_name='object id')),
+                ('language_code', models.CharField(max_length=15, null=True, verbose_name='language code', blank=True)),
+                ('action', models.CharField(max_length=10, verbose_name='action')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0029_person_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonDocument',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('language_code', models.CharField(max_length=15, verbose_name='language code')),
+                ('data', models.TextField(verbose_name='data')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('person', models.ForeignKey(related_name='documents', to='popit.Person')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='persondocument',
+            unique_together=set([('person', 'language_code')]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0030_person_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='persondocument',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='version'),
+        ),
+    ]
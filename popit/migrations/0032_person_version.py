@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0031_person_document_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='version'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('popit', '0032_person_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='changed_at',
+            field=models.DateTimeField(null=True, verbose_name='changed at', blank=True),
+        ),
+    ]
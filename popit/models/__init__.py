@@ -5,3 +5,8 @@ from misc import Contact
 from misc import OtherName
 from person import Person
 
+from name_key import PersonNameKey
+from name_key import PersonNameTrigram
+from change import PersonChange
+
+from document import PersonDocument
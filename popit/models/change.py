@@ -0,0 +1,17 @@
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+# Append only log of everything that happened to persons, read by mirrors through the changes feed.
+# Rows outlive what they describe, so nothing here is a foreign key.
+class PersonChange(models.Model):
+    # The feed cursor
+    id = models.AutoField(primary_key=True)
+    person_id = models.UUIDField(db_index=True, verbose_name=_("person"))
+    # Model name of what changed: person, othername, identifier, contact or link
+    model = models.CharField(max_length=20, verbose_name=_("model"))
+    object_id = models.UUIDField(verbose_name=_("object id"))
+    # Set when a translation changed
+    language_code = models.CharField(max_length=15, null=True, blank=True, verbose_name=_("language code"))
+    action = models.CharField(max_length=10, verbose_name=_("action"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("created at"))
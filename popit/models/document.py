@@ -0,0 +1,20 @@
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+from popit.models.person import Person
+
+
+# A person rendered by PersonSerializer in one language, nested relations and fallbacks included, kept
+# by popit.documents so reads are one row per person. Derived data, dropped whenever the person changes.
+class PersonDocument(models.Model):
+    person = models.ForeignKey(Person, related_name="documents")
+    language_code = models.CharField(max_length=15, verbose_name=_("language code"))
+    # The rendered person as json
+    data = models.TextField(verbose_name=_("data"))
+    # Changes logged for the person when it was rendered, see popit.documents.person_versions
+    version = models.PositiveIntegerField(default=0, verbose_name=_("version"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
+
+    class Meta:
+        unique_together = (
+            ("person", "language_code"),
+        )
@@ -2,6 +2,8 @@ __author__ = 'sweemeng'
 from django.db import models
 from hvad.models import TranslatableModel
 from hvad.models import TranslatedFields
+from popit.models.tracking import TrackChangesMixin
+from popit.models.tracking import track_changes
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.fields import GenericRelation
@@ -15,8 +17,9 @@ from popit.models.exception import PopItFieldNotExist
 # This is the source,
 # This is potentially a json field. See if it is acceptable to lump together sources of different language together.
 # If it is a json field, since we are using postgres, we can potentially save us from performance issue
-class Link(TranslatableModel):
-    id = models.CharField(max_length=255, primary_key=True, blank=True)
+@track_changes
+class Link(TrackChangesMixin, TranslatableModel):
+    id = models.UUIDField(primary_key=True, blank=True)
     label = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("label"))
     # This is our plus stuff, for citation
     field = models.CharField(max_length=20, null=True, blank=True, verbose_name=_("field"))
@@ -24,15 +27,21 @@ class Link(TranslatableModel):
     translation = TranslatedFields(
         note = models.TextField(verbose_name=_("note"), blank=True, null=True)
     )
-    object_id = models.CharField(max_length=255)
+    object_id = models.UUIDField()
     content_type = models.ForeignKey(ContentType)
     content_object = GenericForeignKey("content_type", "object_id")
     created_at = models.DateField(auto_now_add=True, verbose_name=_("created at"))
-    updated_at = models.DateField(auto_now=True, verbose_name=_("updated at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
+
+    class Meta:
+        # Every GenericRelation lookup filters on both
+        index_together = (
+            ("content_type", "object_id"),
+        )
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = str(uuid.uuid4())
+            self.id = uuid.uuid4()
         super(Link, self).save(*args, **kwargs)
 
     def add_citation(self, field, url, note):
@@ -48,8 +57,9 @@ class Link(TranslatableModel):
     def __unicode__(self):
         return self.url
 
-class Contact(TranslatableModel):
-    id = models.CharField(max_length=255, primary_key=True, blank=True)
+@track_changes
+class Contact(TrackChangesMixin, TranslatableModel):
+    id = models.UUIDField(primary_key=True, blank=True)
     translation = TranslatedFields(
         label = models.CharField(max_length=255, verbose_name=_("label"), null=True, blank=True), # hopefully people won't be searching via label :-/
         note = models.TextField(verbose_name=_("note"), blank=True, null=True)
@@ -58,16 +68,22 @@ class Contact(TranslatableModel):
     value = models.CharField(max_length=255, verbose_name=_("value"))
     valid_from = models.DateField(null=True, blank=True, verbose_name=_("valid from"))
     valid_until = models.DateField(null=True, blank=True, verbose_name=_("valid until"))
-    object_id = models.CharField(max_length=255)
+    object_id = models.UUIDField()
     content_type = models.ForeignKey(ContentType)
     content_object = GenericForeignKey("content_type", "object_id")
     links = GenericRelation(Link)
     created_at = models.DateField(auto_now_add=True, verbose_name=_("created at"))
-    updated_at = models.DateField(auto_now=True, verbose_name=_("updated at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
+
+    class Meta:
+        # Every GenericRelation lookup filters on both
+        index_together = (
+            ("content_type", "object_id"),
+        )
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = str(uuid.uuid4())
+            self.id = uuid.uuid4()
         super(Contact, self).save(*args, **kwargs)
 
     def add_citation(self, field, url, note):
@@ -92,25 +108,33 @@ class Contact(TranslatableModel):
         return "%s:%s" % (self.type, self.value)
 
 
-class Identifier(TranslatableModel):
-    id = models.CharField(max_length=255, primary_key=True, blank=True)
-    identifier = models.CharField(max_length=255, verbose_name=_("identifier"))
+@track_changes
+class Identifier(TrackChangesMixin, TranslatableModel):
+    id = models.UUIDField(primary_key=True, blank=True)
+    # Integrations resolve persons by identifier, see popit.views.IdentifierLookup
+    identifier = models.CharField(max_length=255, db_index=True, verbose_name=_("identifier"))
     translations = TranslatedFields(
-        scheme = models.CharField(max_length=255, verbose_name=_("scheme")) # This is not actually skim in Malay fyi
+        scheme = models.CharField(max_length=255, db_index=True, verbose_name=_("scheme")) # This is not actually skim in Malay fyi
     )
 
-    object_id = models.CharField(max_length=255)
+    object_id = models.UUIDField()
     content_type = models.ForeignKey(ContentType)
     content_object = GenericForeignKey("content_type", "object_id")
 
     links = GenericRelation(Link)
 
     created_at = models.DateField(auto_now_add=True, verbose_name=_("created at"))
-    updated_at = models.DateField(auto_now=True, verbose_name=_("updated at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
+
+    class Meta:
+        # Every GenericRelation lookup filters on both
+        index_together = (
+            ("content_type", "object_id"),
+        )
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = str(uuid.uuid4())
+            self.id = uuid.uuid4()
         super(Identifier, self).save(*args, **kwargs)
 
     def add_citation(self, field, url, note):
@@ -137,8 +161,9 @@ class Identifier(TranslatableModel):
 
 # In media, only translated name is used not name in original language
 # unless name uses a different character than in original language :-/
-class OtherName(TranslatableModel):
-    id = models.CharField(max_length=255, primary_key=True, blank=True)
+@track_changes
+class OtherName(TrackChangesMixin, TranslatableModel):
+    id = models.UUIDField(primary_key=True, blank=True)
     translations = TranslatedFields(
         name = models.CharField(max_length=255, verbose_name=_("name")),
          # We don't always get the name of the fllowing field
@@ -154,20 +179,26 @@ class OtherName(TranslatableModel):
     start_date = models.CharField(max_length=20, null=True, blank=True) # Sometime we have no idea
     end_date = models.CharField(max_length=20, null=True, blank=True)
 
-    object_id = models.CharField(max_length=255)
+    object_id = models.UUIDField()
     content_type = models.ForeignKey(ContentType)
     content_object = GenericForeignKey("content_type", "object_id")
 
     links = GenericRelation(Link)
 
     created_at = models.DateField(auto_now_add=True, verbose_name=_("created at"))
-    updated_at = models.DateField(auto_now=True, verbose_name=_("updated at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("updated at"))
 
     note = models.TextField(null=True, blank=True)
 
+    class Meta:
+        # Every GenericRelation lookup filters on both
+        index_together = (
+            ("content_type", "object_id"),
+        )
+
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = str(uuid.uuid4())
+            self.id = uuid.uuid4()
         super(OtherName, self).save(*args, **kwargs)
 
     def add_citation(self, field, url, note):
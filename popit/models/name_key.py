@@ -0,0 +1,26 @@
+from django.db import models
+from popit.models.person import Person
+
+
+# Normalized names of every person, rebuilt by popit.matching whenever a person changes.
+# They are derived data, nothing else points at them.
+class PersonNameKey(models.Model):
+    person = models.ForeignKey(Person, related_name="name_keys")
+    # Folded, honorific free name with its words sorted
+    key = models.CharField(max_length=255, db_index=True)
+
+    class Meta:
+        unique_together = (
+            ("person", "key"),
+        )
+
+
+class PersonNameTrigram(models.Model):
+    person = models.ForeignKey(Person, related_name="name_trigrams")
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        # Candidates are found by trigram, then counted per person
+        unique_together = (
+            ("trigram", "person"),
+        )
@@ -2,6 +2,8 @@ __author__ = 'sweemeng'
 from django.db import models
 from hvad.models import TranslatableModel
 from hvad.models import TranslatedFields
+from popit.models.tracking import TrackChangesMixin
+from popit.models.tracking import track_changes
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.contenttypes.fields import GenericRelation
 from popit.models.misc import OtherName
@@ -13,8 +15,9 @@ import uuid
 
 
 # Citation table is outside of model. Why? Multiple source of information
-class Person(TranslatableModel):
-    id = models.CharField(max_length=255, primary_key=True, blank=True)
+@track_changes
+class Person(TrackChangesMixin, TranslatableModel):
+    id = models.UUIDField(primary_key=True, blank=True)
     translations = TranslatedFields(
         name = models.CharField(max_length=255, verbose_name=_("name")),
         family_name = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("family name")),
@@ -47,7 +50,10 @@ class Person(TranslatableModel):
     contacts = GenericRelation(Contact)
 
     created_at = models.DateField(auto_now_add=True, verbose_name=_("created at"))
-    updated_at = models.DateField(auto_now=True, verbose_name=_("Updated at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
+    # Moved by every change to the person or anything hanging off it, see popit.signals.send_persons_changed
+    version = models.PositiveIntegerField(default=0, verbose_name=_("version"))
+    changed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("changed at"))
 
     def add_citation(self, field, url, note):
         if not hasattr(self, field):
@@ -69,7 +75,7 @@ class Person(TranslatableModel):
 
     def save(self, *args, **kwargs):
         if not self.id:
-            self.id = str(uuid.uuid4())
+            self.id = uuid.uuid4()
         super(Person, self).save(*args, **kwargs)
 
     def __unicode__(self):
@@ -0,0 +1,98 @@
+from django.db.models.signals import post_init
+from hvad.utils import get_cached_translation
+from hvad.utils import set_cached_translation
+
+
+# Models remember the values they were loaded with, so a save without changes writes nothing and a save
+# with some only writes those columns, and only the table of the master/translation pair that changed.
+
+SNAPSHOT_ATTRIBUTE = "_loaded_values"
+
+
+def take_snapshot(instance):
+    # Deferred fields are left out rather than loaded
+    setattr(instance, SNAPSHOT_ATTRIBUTE, dict(
+        (field.attname, instance.__dict__[field.attname])
+        for field in instance._meta.concrete_fields if field.attname in instance.__dict__
+    ))
+
+
+def changed_fields(instance, ignore=()):
+    """
+    Names of the fields of instance that differ from what it was loaded with
+    """
+    snapshot = getattr(instance, SNAPSHOT_ATTRIBUTE, {})
+    changed = []
+    for field in instance._meta.concrete_fields:
+        if field.primary_key or field.name in ignore or field.attname not in instance.__dict__:
+            continue
+        if field.attname not in snapshot or snapshot[field.attname] != instance.__dict__[field.attname]:
+            changed.append(field.name)
+    return changed
+
+
+def translation_snapshot_handler(sender, instance, **kwargs):
+    take_snapshot(instance)
+
+
+class TrackChangesMixin(object):
+    """
+    For TranslatableModel subclasses with an auto_now updated_at. Call track_changes on the class too, for
+    its translations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TrackChangesMixin, self).__init__(*args, **kwargs)
+        take_snapshot(self)
+
+    def changed_fields(self):
+        return changed_fields(self, ignore=("updated_at",))
+
+    def translation_changed(self):
+        translation = get_cached_translation(self)
+        if translation is None:
+            return False
+        return translation._state.adding or bool(changed_fields(translation, ignore=("master",)))
+
+    def has_changes(self):
+        return self._state.adding or bool(self.changed_fields()) or self.translation_changed()
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get("force_insert") or kwargs.get("update_fields") is not None:
+            super(TrackChangesMixin, self).save(*args, **kwargs)
+            self.take_snapshots()
+            return
+
+        changed = self.changed_fields()
+        translation = get_cached_translation(self)
+        translation_changed = self.translation_changed()
+        if not changed and not translation_changed:
+            return
+
+        # updated_at always moves, it is what conditional requests look at. hvad would rewrite the whole
+        # translation row after any save, so it is detached and saved here only when it changed.
+        kwargs["update_fields"] = changed + ["updated_at"]
+        set_cached_translation(self, None)
+        try:
+            super(TrackChangesMixin, self).save(*args, **kwargs)
+        finally:
+            set_cached_translation(self, translation)
+        if translation_changed:
+            translation.master = self
+            if translation._state.adding:
+                translation.save()
+            else:
+                translation.save(update_fields=changed_fields(translation, ignore=("master",)))
+        self.take_snapshots()
+
+    def take_snapshots(self):
+        take_snapshot(self)
+        translation = get_cached_translation(self)
+        if translation is not None:
+            take_snapshot(translation)
+
+
+def track_changes(model):
+    post_init.connect(translation_snapshot_handler, sender=model._meta.translations_model,
+                      dispatch_uid="popit_track_%s" % model._meta.translations_model._meta.db_table)
+    return model
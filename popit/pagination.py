@@ -0,0 +1,28 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.pagination import LimitOffsetPagination
+
+
+class PersonCursorPagination(CursorPagination):
+    # id is unique, so the cursor is a plain keyset position and never needs an offset.
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return self.page_size
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+
+class SearchPagination(LimitOffsetPagination):
+    # Results are ranked, so they are paged by position rather than by a keyset cursor.
+    default_limit = 20
+    max_limit = 100
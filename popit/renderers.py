@@ -0,0 +1,75 @@
+from django.utils import six
+from rest_framework.renderers import BaseRenderer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Python 2 only escapes strings in C when json is written as ascii. DRF writes utf-8 and so escapes every
+# string in python, which is most of the cost of a large response. Non ascii characters come out as \u
+# escapes here, which any json parser reads back to the same text.
+_encoder = JSONEncoder(ensure_ascii=True, separators=(",", ":"))
+
+
+def dumps(data):
+    """
+    data as compact ascii json. Values json has no type for are written as DRF writes them.
+    """
+    return _encoder.encode(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        # Indented json is for people, the browsable api included, DRF renders it
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        return dumps(data).encode("ascii")
+
+
+def ndjson_items(data):
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        return data["results"]
+    if isinstance(data, list):
+        return data
+    return [data]
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    One json document per line: each result of a list, or the single object of a detail. The next page of
+    a paginated list is given in a Link header.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        response = (renderer_context or {}).get("response")
+        if response is not None and isinstance(data, dict) and data.get("next"):
+            response["Link"] = '<%s>; rel="next"' % data["next"]
+        return "".join(dumps(item) + "\n" for item in ndjson_items(data)).encode("ascii")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack for internal consumers, only offered when the msgpack package is installed
+    """
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        # Python 2 byte strings are text here, ids and dates among them, they stay msgpack strings
+        return msgpack.packb(data, default=_encoder.default, use_bin_type=six.PY3)
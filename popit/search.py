@@ -0,0 +1,159 @@
+import re
+import uuid
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Q
+from popit.models import Identifier
+from popit.models import OtherName
+from popit.models import Person
+
+
+# Person search matches names and other names in every language, plus exact identifiers.
+# On postgres it runs on full text indexes created by migration 0026, the expressions below must stay
+# identical to the indexed ones. Other databases fall back to icontains lookups, good enough for tests.
+
+PERSON_DOCUMENT = ("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(given_name, '') || ' ' || "
+                   "coalesce(family_name, ''))")
+OTHER_NAME_DOCUMENT = "to_tsvector('simple', coalesce(name, ''))"
+
+# Identifiers are exact matches, ranked above any name
+IDENTIFIER_RANK = 1.0
+
+POSTGRES_MATCHES = """
+    SELECT master_id AS person_id, ts_rank({person_document}, query) AS rank
+    FROM {person_translation}, plainto_tsquery('simple', %s) query
+    WHERE {person_document} @@ query
+    UNION ALL
+    SELECT other_name.object_id AS person_id, ts_rank({other_name_document}, query) AS rank
+    FROM {other_name_translation}
+    JOIN {other_name} other_name ON other_name.id = master_id, plainto_tsquery('simple', %s) query
+    WHERE other_name.content_type_id = %s AND {other_name_document} @@ query
+    UNION ALL
+    SELECT object_id AS person_id, {identifier_rank} AS rank
+    FROM {identifier}
+    WHERE content_type_id = %s AND identifier = %s
+"""
+
+# A null limit is no limit
+POSTGRES_QUERY = """
+SELECT person_id FROM ({matches}) matches
+GROUP BY person_id
+ORDER BY MAX(rank) DESC, person_id
+LIMIT %s OFFSET %s
+"""
+
+POSTGRES_COUNT = """
+SELECT COUNT(DISTINCT person_id) FROM ({matches}) matches
+"""
+
+
+def search_person_ids(query, limit=None, offset=0):
+    """
+    Ids of the persons matching query, best match first. limit and offset page them in the database.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if connection.vendor == "postgresql":
+        cursor = _execute_postgresql(POSTGRES_QUERY, query, [limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+    person_ids = _search_fallback(query)
+    return person_ids[offset:None if limit is None else offset + limit]
+
+
+def count_person_matches(query):
+    """
+    Number of persons search_person_ids finds for query, without reading them
+    """
+    query = query.strip()
+    if not query:
+        return 0
+    if connection.vendor == "postgresql":
+        return _execute_postgresql(POSTGRES_COUNT, query).fetchone()[0]
+    return len(_search_fallback(query))
+
+
+class SearchResults(object):
+    """
+    The persons matching query, for SearchPagination: count() and each page run one query of their own
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def count(self):
+        return count_person_matches(self.query)
+
+    def __getitem__(self, page):
+        offset = page.start or 0
+        limit = None if page.stop is None else page.stop - offset
+        return search_person_ids(self.query, limit=limit, offset=offset)
+
+
+def _execute_postgresql(statement, query, params=()):
+    person_type = ContentType.objects.get_for_model(Person)
+    matches = POSTGRES_MATCHES.format(
+        person_document=PERSON_DOCUMENT,
+        other_name_document=OTHER_NAME_DOCUMENT,
+        identifier_rank=IDENTIFIER_RANK,
+        person_translation=Person._meta.translations_model._meta.db_table,
+        other_name_translation=OtherName._meta.translations_model._meta.db_table,
+        other_name=OtherName._meta.db_table,
+        identifier=Identifier._meta.db_table,
+    )
+    cursor = connection.cursor()
+    cursor.execute(statement.format(matches=matches), [query, query, person_type.id, person_type.id, query] + list(params))
+    return cursor
+
+
+def _search_fallback(query):
+    person_type = ContentType.objects.get_for_model(Person)
+    # Like plainto_tsquery, every term has to match
+    terms = [term for term in re.split(r"\W+", query, flags=re.UNICODE) if term]
+    scores = None
+    for term in terms:
+        term_scores = defaultdict(float)
+        person_names = Person._meta.translations_model.objects.filter(
+            Q(name__icontains=term) | Q(given_name__icontains=term) | Q(family_name__icontains=term)
+        )
+        for person_id in person_names.values_list("master_id", flat=True):
+            term_scores[person_id] += 1
+        other_names = OtherName._meta.translations_model.objects.filter(
+            name__icontains=term, master__content_type=person_type
+        )
+        for person_id in other_names.values_list("master__object_id", flat=True):
+            term_scores[person_id] += 1
+        if scores is None:
+            scores = term_scores
+        else:
+            scores = dict((person_id, scores[person_id] + score)
+                          for person_id, score in term_scores.items() if person_id in scores)
+
+    scores = dict(scores or {})
+    identifiers = Identifier.objects.filter(content_type=person_type, identifier=query)
+    for person_id in identifiers.values_list("object_id", flat=True):
+        scores[person_id] = scores.get(person_id, 0) + len(terms) + IDENTIFIER_RANK
+
+    return [person_id for person_id, score in sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))]
+
+
+def identifier_person_ids(scheme, identifier, language):
+    """
+    Ids of the persons holding identifier in scheme, scheme being named in language.
+    One query, on the identifier index.
+    """
+    person_type = ContentType.objects.get_for_model(Person)
+    identifiers = Identifier._meta.translations_model.objects.filter(
+        language_code=language, scheme=scheme, master__identifier=identifier, master__content_type=person_type
+    )
+    return list(identifiers.values_list("master__object_id", flat=True).distinct())
+
+
+def load_persons(person_ids, queryset):
+    """
+    The persons of queryset with the given ids, in that order
+    """
+    persons = dict((person.id, person) for person in queryset.filter(id__in=person_ids))
+    person_ids = [person_id if isinstance(person_id, uuid.UUID) else uuid.UUID(person_id) for person_id in person_ids]
+    return [persons[person_id] for person_id in person_ids if person_id in persons]
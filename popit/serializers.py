@@ -4,12 +4,365 @@ from popit.models import Contact
 from popit.models import Link
 from popit.models import Identifier
 from popit.models import OtherName
+from popit.signals import person_changed
+from popit.signals import deferred_person_changes
+from popit.signals import send_persons_changed
 from hvad.contrib.restframework import TranslatableModelSerializer
-from rest_framework.serializers import CharField
+from hvad.contrib.restframework.serializers import TranslatableModelMixin
+from hvad.utils import set_cached_translation
+from popit.fallbacks import language_chain
+from popit.fallbacks import resolve_translation
+from rest_framework.serializers import UUIDField
+from rest_framework.serializers import ListSerializer
+from rest_framework.serializers import ValidationError
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import F
+from django.db.models import Prefetch
+from django.db.models import Value
+from django.db.models import When
+from django.utils import timezone
+from django.db.models.query import prefetch_related_objects
+from django.contrib.contenttypes.models import ContentType
+from collections import OrderedDict
+import uuid
+
+
+# Lookups needed to render a person without going back to the database per row.
+# Keyed by the nested field that needs them. Link and Contact keep their translations under "translation".
+PERSON_RELATED_LOOKUPS = {
+    "other_names": (
+        "other_names", "other_names__translations", "other_names__links", "other_names__links__translation",
+    ),
+    "identifiers": (
+        "identifiers", "identifiers__translations", "identifiers__links", "identifiers__links__translation",
+    ),
+    "contacts": (
+        "contacts", "contacts__translation", "contacts__links", "contacts__links__translation",
+    ),
+    "links": (
+        "links", "links__translation",
+    ),
+}
+
+def select_fields(names, fields=None, expand=None):
+    """
+    Which of names, the fields of a person, are rendered for ?fields= and ?expand=.
+    fields picks fields by name, nested relations included. expand adds nested relations, and alone
+    keeps every plain field. Neither keeps everything.
+    """
+    if fields is None and expand is None:
+        return list(names)
+    if fields is None:
+        selected = set(name for name in names if name not in PERSON_RELATED_LOOKUPS)
+    else:
+        selected = set(fields)
+    selected.update(expand or ())
+    return [name for name in names if name in selected]
+
+
+def related_lookups(relations=None, languages=None):
+    """
+    Prefetch lookups of the given nested relations, all of them by default.
+    With languages, translations are only fetched in those languages.
+    """
+    if relations is None:
+        relations = PERSON_RELATED_LOOKUPS.keys()
+    lookups = []
+    for relation in relations:
+        lookups.extend(PERSON_RELATED_LOOKUPS.get(relation, ()))
+    if languages is None:
+        return lookups
+    return [translation_lookup(lookup, languages) for lookup in lookups]
+
+
+def translation_lookup(lookup, languages):
+    """
+    lookup as a Prefetch of the translations in languages when it ends on a translations accessor,
+    unchanged otherwise
+    """
+    model = Person
+    for part in lookup.split("__")[:-1]:
+        model = model._meta.get_field(part).related_model
+    last = lookup.split("__")[-1]
+    if last != getattr(model._meta, "translations_accessor", None):
+        return lookup
+    translations = model._meta.translations_model.objects.filter(language_code__in=languages)
+    return Prefetch(lookup, queryset=translations)
+
+
+# Nested fields a serializer may carry, and the model each of them creates.
+CHILD_MODELS = {
+    "other_names": OtherName,
+    "identifiers": Identifier,
+    "contacts": Contact,
+    "links": Link,
+}
+
+
+def split_translated(model, data):
+    """
+    Pops the translated fields of model out of data and returns them
+    """
+    translated = {}
+    for field in model._meta.translations_model._meta.fields:
+        if field.name in ("id", "master", "language_code"):
+            continue
+        if field.name in data:
+            translated[field.name] = data.pop(field.name)
+    return translated
+
+
+def bulk_update(model, changes):
+    """
+    Applies changes, {pk: {field name: value}}, to rows of model in a single UPDATE.
+    Fields a row does not change keep their value.
+    """
+    if not changes:
+        return
+    by_field = {}
+    for pk, values in changes.items():
+        for name, value in values.items():
+            by_field.setdefault(name, []).append((pk, value))
+    updates = {}
+    for name, values in by_field.items():
+        field = model._meta.get_field(name)
+        whens = [When(pk=pk, then=Value(value, output_field=field)) for pk, value in values]
+        updates[name] = Case(*whens, default=F(name), output_field=field)
+    model.objects.filter(pk__in=list(changes)).update(**updates)
+
+
+class BulkWriter(object):
+    """
+    Collects validated serializer data for masters, translations and nested children, then writes each
+    table with a single bulk_create. save() does not run model save() nor send signals.
+    """
+
+    def __init__(self, language_code):
+        self.language_code = language_code
+        self.objects = OrderedDict()
+        self.translations = OrderedDict()
+
+    def add(self, model, validated_data, parent=None):
+        data = dict(validated_data)
+        data.pop("language_code", None)
+        children = [(CHILD_MODELS[key], data.pop(key)) for key in list(data) if key in CHILD_MODELS]
+
+        translation_model = model._meta.translations_model
+        translated = split_translated(model, data)
+
+        obj = model(**data)
+        if not obj.id:
+            obj.id = uuid.uuid4()
+        if parent is not None:
+            obj.content_type = ContentType.objects.get_for_model(parent)
+            obj.object_id = parent.id
+        self.objects.setdefault(model, []).append(obj)
+        self.translations.setdefault(translation_model, []).append(
+            translation_model(master_id=obj.id, language_code=self.language_code, **translated)
+        )
+
+        for child_model, items in children:
+            for item in items:
+                self.add(child_model, item, parent=obj)
+        return obj
+
+    def save(self):
+        for model, objs in self.objects.items():
+            model.objects.bulk_create(objs)
+        for model, objs in self.translations.items():
+            model.objects.bulk_create(objs)
+
+
+class BulkUpdater(object):
+    """
+    Applies nested serializer data to existing children and links, given by id, and creates the others.
+    Every referenced id is looked up with one query per table, changes are found in memory and written
+    with one UPDATE per table, new rows with a BulkWriter. Sends no signals.
+    Ids that belong to another parent are refused with a ValidationError, under the field they were given in.
+    """
+
+    def __init__(self, language_code):
+        self.language_code = language_code
+        self.items = []
+        self.writer = BulkWriter(language_code)
+        self.shared_changes = {}
+        self.translation_changes = {}
+        self.errors = {}
+
+    def add(self, model, validated_data, parent, field):
+        self.items.append((model, validated_data, parent, field))
+
+    def referenced_ids(self):
+        ids = {}
+        pending = [(model, data) for model, data, parent, field in self.items]
+        while pending:
+            model, data = pending.pop()
+            if data.get("id"):
+                ids.setdefault(model, set()).add(data["id"])
+            pending.extend((Link, link) for link in data.get("links", ()))
+        return ids
+
+    def save(self):
+        """
+        Writes the changes, returns whether there were any
+        """
+        self.existing = {}
+        self.translations = {}
+        for model, ids in self.referenced_ids().items():
+            self.existing[model] = dict((obj.id, obj) for obj in model.objects.untranslated().filter(id__in=ids))
+            translations = model._meta.translations_model.objects.filter(
+                master_id__in=ids, language_code=self.language_code
+            )
+            self.translations[model] = dict((translation.master_id, translation) for translation in translations)
+
+        for model, data, parent, field in self.items:
+            self.apply(model, data, parent, field)
+        if self.errors:
+            raise ValidationError(self.errors)
+
+        for model, changes in self.shared_changes.items():
+            bulk_update(model, changes)
+        for model, changes in self.translation_changes.items():
+            bulk_update(model, changes)
+        self.writer.save()
+        return bool(self.shared_changes or self.writer.objects or self.writer.translations)
+
+    def refuse(self, field, model, pk):
+        self.errors.setdefault(field, []).append(
+            "%s %s belongs to another entity" % (model._meta.verbose_name.capitalize(), pk)
+        )
+
+    def apply(self, model, validated_data, parent, field):
+        obj = self.existing.get(model, {}).get(validated_data.get("id"))
+        if obj is None:
+            # Links of a new row cannot exist yet
+            for link in validated_data.get("links", ()):
+                if link.get("id") in self.existing.get(Link, {}):
+                    self.refuse(field, Link, link["id"])
+            self.writer.add(model, validated_data, parent=parent)
+            return
+        if obj.content_type_id != ContentType.objects.get_for_model(parent).id or obj.object_id != parent.id:
+            self.refuse(field, model, obj.id)
+            return
+
+        data = dict(validated_data)
+        links = data.pop("links", [])
+        for name in ("id", "language_code", "created_at", "updated_at"):
+            data.pop(name, None)
+        translated = split_translated(model, data)
+
+        shared = dict((name, value) for name, value in data.items() if getattr(obj, name) != value)
+        translation = self.translations[model].get(obj.id)
+        if translation is None:
+            translation_model = model._meta.translations_model
+            self.writer.translations.setdefault(translation_model, []).append(
+                translation_model(master_id=obj.id, language_code=self.language_code, **translated)
+            )
+            changed = True
+        else:
+            translated = dict(
+                (name, value) for name, value in translated.items() if getattr(translation, name) != value
+            )
+            if translated:
+                self.translation_changes.setdefault(type(translation), {})[translation.pk] = translated
+            changed = bool(translated)
+
+        if shared or changed:
+            shared["updated_at"] = timezone.now()
+            self.shared_changes.setdefault(model, {})[obj.id] = shared
 
+        for link in links:
+            self.apply(Link, link, obj, field)
+
+
+def given_ids(model, validated_data, field):
+    """
+    (model, id, field) of validated_data and everything nested in it that was given an id, field being the
+    field of the person they came in
+    """
+    if validated_data.get("id"):
+        yield model, validated_data["id"], field
+    for key, child_model in CHILD_MODELS.items():
+        for item in validated_data.get(key, ()):
+            for given in given_ids(child_model, item, field if model is not Person else key):
+                yield given
+
+
+class PersonListSerializer(ListSerializer):
+    """
+    Used by PersonSerializer(many=True). Creating persons is all or nothing, in one bulk_create per table.
+    """
+
+    def to_internal_value(self, data):
+        # Errors raised by validate() end up under non_field_errors, these belong to their items
+        return self.validate_ids(super(PersonListSerializer, self).to_internal_value(data))
+
+    def validate_ids(self, attrs):
+        # bulk_create would fail the whole list on a taken id, each one is reported against its own item
+        errors = [{} for data in attrs]
+        items = {}
+        for index, data in enumerate(attrs):
+            for model, pk, field in given_ids(Person, data, "id"):
+                if (model, pk) in items:
+                    errors[index].setdefault(field, []).append(
+                        "%s %s is given more than once" % (model._meta.verbose_name.capitalize(), pk)
+                    )
+                else:
+                    items[(model, pk)] = (index, field)
+
+        ids = {}
+        for model, pk in items:
+            ids.setdefault(model, []).append(pk)
+        for model, pks in ids.items():
+            for pk in model.objects.untranslated().filter(id__in=pks).values_list("id", flat=True):
+                index, field = items[(model, pk)]
+                errors[index].setdefault(field, []).append(
+                    "%s %s already exists" % (model._meta.verbose_name.capitalize(), pk)
+                )
+        if any(errors):
+            raise ValidationError(errors)
+        return attrs
 
-class LinkSerializer(TranslatableModelSerializer):
-    id = CharField(max_length=255, required=False)
+    def create(self, validated_data):
+        writer = BulkWriter(self.child.language)
+        with transaction.atomic():
+            persons = [writer.add(Person, data) for data in validated_data]
+            writer.save()
+        # bulk_create sends no post_save, tell listeners directly, all persons at once
+        send_persons_changed((person.id, person, "created") for person in persons)
+
+        # Reload so the response renders the nested relations, still in a fixed number of queries
+        queryset = PersonSerializer.setup_eager_loading(
+            Person.objects.untranslated().filter(id__in=[person.id for person in persons])
+        )
+        loaded = dict((person.id, person) for person in queryset)
+        return [loaded[person.id] for person in persons]
+
+
+class PopItTranslatableSerializer(TranslatableModelSerializer):
+    """
+    Nested serializers render in the language of their parent, so a whole person is read from
+    translations of one language and can be served from what setup_eager_loading prefetched.
+    Missing translations fall back along the language chain of popit.fallbacks.
+    """
+
+    def to_representation(self, instance):
+        language = getattr(self, "language", None)
+        if not language:
+            return super(PopItTranslatableSerializer, self).to_representation(instance)
+
+        for field in self.fields.values():
+            child = getattr(field, "child", None)
+            if isinstance(child, TranslatableModelSerializer):
+                child.language = language
+        set_cached_translation(instance, resolve_translation(instance, language_chain(language)))
+        # hvad would reload a translation in the requested language, dropping the fallback
+        return super(TranslatableModelMixin, self).to_representation(instance)
+
+
+class LinkSerializer(PopItTranslatableSerializer):
+    id = UUIDField(required=False)
 
     class Meta:
         model = Link
@@ -17,9 +370,9 @@ class LinkSerializer(TranslatableModelSerializer):
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
 
 
-class ContactSerializer(TranslatableModelSerializer):
+class ContactSerializer(PopItTranslatableSerializer):
 
-    id = CharField(max_length=255, required=False)
+    id = UUIDField(required=False)
     links = LinkSerializer(many=True, required=False)
 
     class Meta:
@@ -28,9 +381,9 @@ class ContactSerializer(TranslatableModelSerializer):
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
 
 
-class IdentifierSerializer(TranslatableModelSerializer):
+class IdentifierSerializer(PopItTranslatableSerializer):
 
-    id = CharField(max_length=255, required=False)
+    id = UUIDField(required=False)
     links = LinkSerializer(many=True, required=False)
 
     class Meta:
@@ -39,9 +392,9 @@ class IdentifierSerializer(TranslatableModelSerializer):
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
 
 
-class OtherNameSerializer(TranslatableModelSerializer):
+class OtherNameSerializer(PopItTranslatableSerializer):
 
-    id = CharField(max_length=255, required=False)
+    id = UUIDField(required=False)
     links = LinkSerializer(many=True, required=False)
 
     class Meta:
@@ -50,13 +403,55 @@ class OtherNameSerializer(TranslatableModelSerializer):
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
 
 
-class PersonSerializer(TranslatableModelSerializer):
+class PersonSerializer(PopItTranslatableSerializer):
 
     other_names = OtherNameSerializer(many=True, required=False)
     identifiers = IdentifierSerializer(many=True, required=False)
     links = LinkSerializer(many=True, required=False)
     contacts = ContactSerializer(many=True, required=False)
 
+    def __init__(self, *args, **kwargs):
+        # Sparse fieldsets, see select_fields
+        fields = kwargs.pop("fields", None)
+        expand = kwargs.pop("expand", None)
+        super(PersonSerializer, self).__init__(*args, **kwargs)
+        if fields is not None or expand is not None:
+            selected = select_fields(self.fields.keys(), fields, expand)
+            for name in list(self.fields.keys()):
+                if name not in selected:
+                    self.fields.pop(name)
+
+    @staticmethod
+    def selected_relations(fields=None, expand=None):
+        """
+        The nested relations rendered for fields and expand, None standing for all of them
+        """
+        if fields is None and expand is None:
+            return None
+        return select_fields(PERSON_RELATED_LOOKUPS.keys(), fields or (), expand)
+
+    @staticmethod
+    def setup_eager_loading(queryset, relations=None, languages=None):
+        """
+        Prefetch translations, child relations and their links so a page of persons is rendered
+        in a fixed number of queries, whatever the page size. Only the given nested relations are
+        prefetched when there are some, and only translations in languages when they are given,
+        usually the language_chain of the request.
+        """
+        lookups = ["translations"] + related_lookups(relations)
+        if languages is not None:
+            lookups = [translation_lookup(lookup, languages) for lookup in lookups]
+        return queryset.prefetch_related(*lookups)
+
+    @staticmethod
+    def load_related(persons, relations=None, languages=None):
+        """
+        Same as setup_eager_loading, for persons that are already fetched, such as the result of
+        Person.objects.language(...).get(). Their own translations are expected to be loaded already.
+        """
+        prefetch_related_objects(persons, related_lookups(relations, languages))
+        return persons
+
     def create(self, validated_data):
         language_code=self.language
         links = validated_data.pop("links")
@@ -65,19 +460,21 @@ class PersonSerializer(TranslatableModelSerializer):
         identifiers = validated_data.pop("identifiers")
         # Where do the language come from inside the create function
         validated_data.pop("language_code", [])
-        person = Person.objects.language(language_code).create(**validated_data)
+        # Every row sends its own signals, listeners get them once the person is complete
+        with deferred_person_changes(), transaction.atomic():
+            person = Person.objects.language(language_code).create(**validated_data)
 
-        for other_name in other_names:
-            self.create_child(other_name, OtherName, person)
+            for other_name in other_names:
+                self.create_child(other_name, OtherName, person)
 
-        for contact in contacts:
-            self.create_child(contact, Contact, person)
+            for contact in contacts:
+                self.create_child(contact, Contact, person)
 
-        for identifier in identifiers:
-            self.create_child(identifier, Identifier, person)
+            for identifier in identifiers:
+                self.create_child(identifier, Identifier, person)
 
-        for link in links:
-            self.create_links(link, person)
+            for link in links:
+                self.create_links(link, person)
         return person
 
     def create_links(self, validated_data, entity):
@@ -105,7 +502,7 @@ class PersonSerializer(TranslatableModelSerializer):
         # Now sure if save everytime we update a good idea. On the other hand, not like everyone can update anyway.
         # Also some field is not added, maybe I should add patronymic name and sort name =.=
         instance.name = validated_data.get("name", instance.name)
-        instance.family_name = validated_data.get("family_name", instance.name)
+        instance.family_name = validated_data.get("family_name", instance.family_name)
         instance.given_name = validated_data.get("given_name", instance.given_name)
         instance.additional_name = validated_data.get("additional_name", instance.additional_name)
         instance.honorific_prefix = validated_data.get("honorific_prefix", instance.honorific_prefix)
@@ -118,69 +515,23 @@ class PersonSerializer(TranslatableModelSerializer):
         instance.summary = validated_data.get("summary", instance.summary)
         instance.biography = validated_data.get("biography", instance.biography)
         instance.national_identity = validated_data.get("national_identity", instance.national_identity)
-        instance.save()
-
-        links = validated_data.pop("links", [])
-        for link in links:
-            self.update_links(link, instance)
-
-        identifiers = validated_data.pop("identifiers", [])
-
-        for identifier in identifiers:
-            self.update_childs(identifier, Identifier, instance)
-
-        contacts = validated_data.pop("contacts", [])
-        for contact in contacts:
-            self.update_childs(contact, Contact, instance)
-
-        other_names = validated_data.pop("other_names", [])
-        for other_name in other_names:
-            self.update_childs(other_name, OtherName, instance)
+        # Listeners hear of the update once, after it is committed
+        with deferred_person_changes(), transaction.atomic():
+            # A save without changes writes nothing and sends nothing, see popit.models.tracking
+            instance.save()
+            updater = BulkUpdater(instance.language_code)
+            for key in ("links", "identifiers", "contacts", "other_names"):
+                for child in validated_data.pop(key, []):
+                    updater.add(CHILD_MODELS[key], child, instance, key)
+            if updater.save():
+                # Children were written in bulk, without their own signals
+                person_changed.send(sender=Person, person_id=instance.id, instance=instance, action="updated")
         return instance
 
-    def update_childs(self, validated_data, child, parent):
-        # parent mostly exist at create,
-        language_code = parent.language_code
-        if validated_data.get("id"):
-            objs = child.objects.language(language_code).filter(id=validated_data.get("id"))
-            if not objs:
-                self.create_child(validated_data, child, parent)
-            else:
-                obj = objs[0]
-
-                links = validated_data.pop("links", [])
-
-                for key, value in validated_data.iteritems():
-                    if key in ("id", "language_code", "created_at" "updated_at"):
-                        continue
-                    setattr(obj, key, value)
-
-                obj.save()
-
-                for link in links:
-                    self.update_links(link, obj)
-        else:
-            self.create_child(validated_data, child, parent)
-
-    def update_links(self, validated_data, parent):
-        language_code = parent.language_code
-
-        if validated_data.get("id"):
-            links = Link.objects.language(language_code).filter(id=validated_data.get("id"))
-            if not links:
-                self.create_links(validated_data, parent)
-            else:
-                link = links[0]
-                link.label = validated_data.get("label", link.label)
-                link.field = validated_data.get("field", link.field)
-                link.url = validated_data.get("url", link.url)
-                link.note = validated_data.get("note", link.note)
-                link.save()
-        else:
-            self.create_links(validated_data, parent)
-
     class Meta:
         model = Person
+        list_serializer_class = PersonListSerializer
+        exclude = ("version", "changed_at")
         extra_kwargs = {'id': {'read_only': False, 'required': False}}
 
 
@@ -0,0 +1,132 @@
+import copy
+import threading
+from contextlib import contextmanager
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.db.models.signals import pre_delete
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.utils import timezone
+from popit.models import Contact
+from popit.models import Identifier
+from popit.models import Link
+from popit.models import OtherName
+from popit.models import Person
+
+
+# Sent whenever a person, anything hanging off it, or any of their translations is saved or deleted.
+# person_id is the person the change belongs to, instance is the object that was saved or deleted.
+person_changed = Signal(providing_args=["person_id", "instance", "action"])
+
+# What caches, indexes and logs listen to: changes is a list of (person_id, instance, action), so a bulk
+# write is handled with a query per table rather than per person. Every person_changed is forwarded here
+# as a batch of one. The version of the persons is moved before it is sent.
+persons_changed = Signal(providing_args=["changes"])
+
+PERSON_MODELS = (Person, OtherName, Identifier, Contact, Link)
+
+
+def person_id_for(instance):
+    """
+    Walk from a person, a child object or a translation up to the id of the person it belongs to.
+    Returns None when the owner is not a person or does not exist anymore.
+    """
+    if isinstance(instance, Person):
+        return instance.id
+
+    shared_model = getattr(instance._meta, "shared_model", None)
+    if shared_model is Person:
+        return instance.master_id
+    if shared_model is not None:
+        parent = shared_model.objects.filter(id=instance.master_id).values_list("content_type", "object_id").first()
+        if parent is None:
+            return None
+        content_type_id, object_id = parent
+    else:
+        content_type_id, object_id = instance.content_type_id, instance.object_id
+
+    while True:
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is Person:
+            return object_id
+        if model not in PERSON_MODELS:
+            return None
+        parent = model.objects.filter(id=object_id).values_list("content_type", "object_id").first()
+        if parent is None:
+            return None
+        content_type_id, object_id = parent
+
+
+def send_person_changed(instance, action, person_id=None):
+    if person_id is None:
+        person_id = person_id_for(instance)
+    if person_id is not None:
+        person_changed.send(sender=type(instance), person_id=person_id, instance=instance, action=action)
+
+
+# Changes collected by the deferred_person_changes block running on this thread, None outside of one
+_deferred = threading.local()
+
+
+def send_persons_changed(changes):
+    changes = list(changes)
+    if not changes:
+        return
+    collected = getattr(_deferred, "changes", None)
+    if collected is not None:
+        # A delete clears the id of its objects once the cascade is over, listeners get them as they were
+        collected.extend((person_id, copy.copy(instance) if action == "deleted" else instance, action)
+                         for person_id, instance, action in changes)
+        return
+    person_ids = set(person_id for person_id, instance, action in changes)
+    Person.objects.filter(id__in=person_ids).update(version=F("version") + 1, changed_at=timezone.now())
+    persons_changed.send(sender=Person, changes=changes)
+
+
+@contextmanager
+def deferred_person_changes():
+    """
+    Holds back persons_changed for the changes made in the block and sends them as one batch once it is
+    over, so a person saved with its children is rebuilt and invalidated once, after the transaction the
+    block wraps. Nothing is sent when the block fails. Nested blocks leave it to the outermost one.
+    """
+    if getattr(_deferred, "changes", None) is not None:
+        yield
+        return
+    _deferred.changes = []
+    try:
+        yield
+        changes = _deferred.changes
+    finally:
+        _deferred.changes = None
+    send_persons_changed(changes)
+
+
+def person_changed_handler(sender, person_id, instance, action, **kwargs):
+    send_persons_changed([(person_id, instance, action)])
+
+
+def saved_handler(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        # loaddata, nothing is cached for data that did not exist
+        return
+    send_person_changed(instance, "created" if created else "updated")
+
+
+def deleting_handler(sender, instance, **kwargs):
+    # The rows a deleted object hangs from may go before it in the same cascade, its person is found first
+    instance._popit_person_id = person_id_for(instance)
+
+
+def deleted_handler(sender, instance, **kwargs):
+    send_person_changed(instance, "deleted", getattr(instance, "_popit_person_id", None))
+
+
+for model in PERSON_MODELS:
+    for sender in (model, model._meta.translations_model):
+        post_save.connect(saved_handler, sender=sender, dispatch_uid="popit_saved_%s" % sender._meta.db_table)
+        pre_delete.connect(deleting_handler, sender=sender, dispatch_uid="popit_deleting_%s" % sender._meta.db_table)
+        post_delete.connect(deleted_handler, sender=sender, dispatch_uid="popit_deleted_%s" % sender._meta.db_table)
+
+person_changed.connect(person_changed_handler, dispatch_uid="popit_persons_changed")
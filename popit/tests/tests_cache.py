@@ -0,0 +1,82 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from popit import cache
+from popit.models import Person
+from popit.models import Contact
+from popit.models import Identifier
+from popit.models import Link
+
+
+def cached_detail(language, pk):
+    return cache.get_person_detail(cache.person_generation(pk), language, pk)
+
+
+class PersonDetailCacheTestCase(APITestCase):
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def test_detail_served_from_cache(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            cached = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        self.assertEqual(cached.content, response.content)
+
+    def test_cache_per_language(self):
+        self.client.get("/en/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        self.assertTrue(cached_detail("en", "ab1a5788e5bae955c048748fa6af0e97"))
+        self.assertEqual(cached_detail("ms", "ab1a5788e5bae955c048748fa6af0e97"), None)
+
+    def test_invalidate_on_person_save(self):
+        self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        person = Person.objects.language("en").get(id="8497ba86-7485-42d2-9596-2ab14520f1f4")
+        person.name = "Johnny"
+        person.save()
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        self.assertEqual(response.data["name"], "Johnny")
+
+    def test_invalidate_on_child_translation_save(self):
+        self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        identifier = Identifier.objects.language("en").get(id="af7c01b5-1c4f-4c08-9174-3de5ff270bdb")
+        translation = identifier.translations.get(language_code="en")
+        translation.scheme = "new scheme"
+        translation.save()
+        self.assertEqual(cached_detail("en", "8497ba86-7485-42d2-9596-2ab14520f1f4"), None)
+
+    def test_invalidate_on_nested_link_delete(self):
+        self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        Link.objects.language("en").get(id="9c9a2093-c3eb-4b51-b869-0d3b4ab281fd").delete()
+        self.assertEqual(cached_detail("en", "8497ba86-7485-42d2-9596-2ab14520f1f4"), None)
+
+    def test_invalidate_on_api_update(self):
+        self.client.get("/en/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.client.put("/en/persons/ab1a5788e5bae955c048748fa6af0e97/", {
+            "contacts": [{"id": "a66cb422-eec3-4861-bae1-a64ae5dbde61", "value": "0123421222"}]
+        })
+        self.client.credentials()
+        response = self.client.get("/en/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        self.assertEqual(response.data["contacts"][0]["value"], "0123421222")
+
+    def test_other_person_untouched(self):
+        self.client.get("/en/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        contact = Contact.objects.language("en").get(id="2256ec04-2d1d-4994-b1f1-16d3f5245441")
+        contact.value = "0000"
+        contact.save()
+        self.assertTrue(cached_detail("en", "ab1a5788e5bae955c048748fa6af0e97"))
+
+    def test_detail_stored_after_write_not_served(self):
+        pk = "8497ba86-7485-42d2-9596-2ab14520f1f4"
+        generation = cache.person_generation(pk)
+        person = Person.objects.language("en").get(id=pk)
+        person.name = "Johnny"
+        person.save()
+        # As stored by a read that rendered the person before the write and finished after it
+        cache.set_person_detail(generation, "en", pk, {"id": pk, "name": "John"})
+        self.assertEqual(cached_detail("en", pk), None)
+        response = self.client.get("/en/persons/%s/" % pk)
+        self.assertEqual(response.data["name"], "Johnny")
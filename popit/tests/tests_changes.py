@@ -0,0 +1,66 @@
+from django.test.utils import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.models import Contact
+from popit.models import Person
+from popit.models import PersonChange
+
+
+@override_settings(POPIT_CHANGES_SETTLE_SECONDS=0)
+class ChangeFeedTestCase(APITestCase):
+
+    def setUp(self):
+        self.person = Person.objects.language("en").create(name="John")
+        self.contact = Contact.objects.language("en").create(type="phone", value="0", content_object=self.person)
+
+    def test_log(self):
+        changes = list(PersonChange.objects.order_by("id").values_list("model", "action", "language_code"))
+        # hvad saves the translation from the post_save of its master, before the master is logged
+        self.assertEqual(changes, [
+            ("person", "created", "en"),
+            ("person", "created", None),
+            ("contact", "created", "en"),
+            ("contact", "created", None),
+        ])
+        self.assertTrue(all(change.person_id == self.person.id for change in PersonChange.objects.all()))
+
+    def test_feed(self):
+        response = self.client.get("/changes/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[3], {
+            "cursor": results[3]["cursor"],
+            "person": str(self.person.id),
+            "model": "contact",
+            "id": str(self.contact.id),
+            "action": "created",
+            "at": results[3]["at"],
+        })
+        self.assertEqual(results[2]["language_code"], "en")
+
+        cursor = response.data["cursor"]
+        self.contact.delete()
+        response = self.client.get("/changes/", {"since": cursor})
+        self.assertEqual([(change["model"], change["action"]) for change in response.data["results"]],
+                         [("contact", "deleted"), ("contact", "deleted")])
+
+        response = self.client.get("/changes/", {"since": response.data["cursor"]})
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["cursor"], cursor + 2)
+
+    def test_feed_limit(self):
+        response = self.client.get("/changes/", {"limit": 1})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get("/changes/", {"since": response.data["cursor"], "limit": 10})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_feed_invalid_cursor(self):
+        response = self.client.get("/changes/", {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(POPIT_CHANGES_SETTLE_SECONDS=60)
+    def test_feed_settles(self):
+        response = self.client.get("/changes/")
+        self.assertEqual(response.data["results"], [])
+        self.assertEqual(response.data["cursor"], 0)
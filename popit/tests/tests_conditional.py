@@ -0,0 +1,97 @@
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit import cache
+from popit import conditional
+from popit.models import Person
+from popit.models import Contact
+from popit.models import Link
+import time
+
+
+class ConditionalGetTestCase(APITestCase):
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def test_detail_headers(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+
+    def test_detail_if_none_match(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                       HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_if_modified_since(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                   HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_per_language(self):
+        en = self.client.get("/en/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        ms = self.client.get("/ms/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        self.assertNotEqual(en["ETag"], ms["ETag"])
+
+    def test_detail_etag_changes_on_child_update(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        contact = Contact.objects.language("en").get(id="2256ec04-2d1d-4994-b1f1-16d3f5245441")
+        contact.value = "0000"
+        contact.save()
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_changes_on_nested_link_delete(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        Link.objects.language("en").get(id="9c9a2093-c3eb-4b51-b869-0d3b4ab281fd").delete()
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_changes_on_translation_delete(self):
+        response = self.client.get("/ms/persons/ab1a5788e5bae955c048748fa6af0e97/")
+        self.assertEqual(response.data["language_code"], "ms")
+        person = Person.objects.language("ms").get(id="ab1a5788e5bae955c048748fa6af0e97")
+        person.translations.get(language_code="ms").delete()
+        response = self.client.get("/ms/persons/ab1a5788e5bae955c048748fa6af0e97/",
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["language_code"], "en")
+
+    def test_detail_freshness_cached_by_generation(self):
+        pk = "ab1a5788e5bae955c048748fa6af0e97"
+        generation = cache.person_generation(pk)
+        freshness = conditional.person_freshness(pk)
+        Person.objects.filter(id=pk).update(version=100)
+        cache.invalidate_person(pk)
+        # As stored by a read of the person that finished after the write was committed and invalidated
+        cache.get_cache().set(cache.person_freshness_key(generation, pk), freshness)
+        self.assertEqual(conditional.cached_person_freshness(pk)[1], 100)
+
+    def test_list_if_none_match(self):
+        response = self.client.get("/en/persons/")
+        self.assertTrue(response["ETag"])
+        response = self.client.get("/en/persons/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_on_create(self):
+        response = self.client.get("/en/persons/")
+        Person.objects.language("en").create(name="Jane")
+        response = self.client.get("/en/persons/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_changes_on_delete(self):
+        response = self.client.get("/en/persons/")
+        Link.objects.language("en").get(id="9c9a2093-c3eb-4b51-b869-0d3b4ab281fd").delete()
+        response = self.client.get("/en/persons/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_freshness_reads_no_table(self):
+        with self.assertNumQueries(0):
+            conditional.persons_freshness()
@@ -0,0 +1,98 @@
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+from popit import dedupe
+from popit.dedupe import find_duplicates
+from popit.dedupe import merge_persons
+from popit.dedupe import score_pair
+from popit.models import Contact
+from popit.models import Identifier
+from popit.models import Link
+from popit.models import OtherName
+from popit.models import Person
+
+
+class DedupeTestCase(TestCase):
+
+    def setUp(self):
+        self.first = Person.objects.language("en").create(name="Dato' Sri Mohd Najib bin Tun Abdul Razak",
+                                                          birth_date="1953-07-23")
+        Identifier.objects.language("en").create(scheme="ic", identifier="530723", content_object=self.first)
+        self.second = Person.objects.language("en").create(name="Najib Razak", email="najib@example.com")
+        self.second.translate("ms")
+        self.second.name = "Najib Tun Razak"
+        self.second.save()
+        Identifier.objects.language("en").create(scheme="IC", identifier="530723", content_object=self.second)
+        Contact.objects.language("en").create(type="phone", value="0123", content_object=self.second)
+        OtherName.objects.language("en").create(name="Ajib", content_object=self.second)
+        self.third = Person.objects.language("en").create(name="Lim Kit Siang", birth_date="1941-02-20")
+
+    def test_score_pair(self):
+        score, reasons = score_pair((("najib razak",), "", (("ic", "1"),)), (("najib razak",), "", (("ic", "1"),)))
+        self.assertAlmostEqual(score, 0.9)
+        score, reasons = score_pair((("najib razak",), "", (("ic", "1"),)), (("najib razak",), "", (("ic", "2"),)))
+        self.assertAlmostEqual(score, 0.3)
+        self.assertIn("different ic", reasons)
+
+    def test_find_duplicates(self):
+        duplicates = find_duplicates(0.5, processes=1)
+        self.assertEqual(len(duplicates), 1)
+        first_id, second_id, score, reasons = duplicates[0]
+        self.assertEqual(set([first_id, second_id]), set([self.first.id.hex, self.second.id.hex]))
+        # Part of the name and the identifier
+        self.assertTrue(0.5 < score < 0.9)
+        self.assertEqual(reasons[1], "identifier ic:530723")
+
+    def test_find_duplicates_in_processes(self):
+        chunk_size = dedupe.SCORE_CHUNK_SIZE
+        dedupe.SCORE_CHUNK_SIZE = 1
+        Person.objects.language("en").create(name="Najib Razak")
+        try:
+            self.assertEqual(len(find_duplicates(0.0, processes=1)), 2)
+            self.assertEqual(find_duplicates(0.0, processes=2), find_duplicates(0.0, processes=1))
+        finally:
+            dedupe.SCORE_CHUNK_SIZE = chunk_size
+
+    def test_report(self):
+        output = StringIO()
+        call_command("dedupe_persons", threshold=0.5, processes=1, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "person,duplicate,score,reasons")
+        self.assertEqual(len(lines), 2)
+
+    def test_merge(self):
+        merge_persons(self.first, [self.second])
+
+        self.assertFalse(Person.objects.filter(id=self.second.id).exists())
+        person = Person.objects.language("ms").get(id=self.first.id)
+        self.assertEqual(person.name, "Najib Tun Razak")
+        self.assertEqual(person.email, "najib@example.com")
+        self.assertEqual(person.birth_date, "1953-07-23")
+        # "IC" and "ic" are the same scheme, person keeps its own
+        self.assertEqual(list(person.identifiers.language("en").values_list("scheme", "identifier")), [("ic", "530723")])
+        self.assertEqual(person.contacts.untranslated().count(), 1)
+        self.assertEqual(
+            set(person.other_names.language("en").values_list("name", flat=True)),
+            set(["Ajib", "Najib Razak"])
+        )
+
+    def test_merge_keeps_links_of_dropped_identifiers(self):
+        identifier = self.second.identifiers.untranslated().get()
+        Link.objects.language("en").create(url="http://sinarproject.org", content_object=identifier)
+        Identifier.objects.language("en").create(scheme="passport", identifier="A1", content_object=self.second)
+
+        merge_persons(self.first, [self.second])
+        person = Person.objects.language("en").get(id=self.first.id)
+        self.assertEqual(
+            sorted(person.identifiers.language("en").values_list("scheme", "identifier")),
+            [("ic", "530723"), ("passport", "A1")]
+        )
+        kept = person.identifiers.untranslated().get(identifier="530723")
+        self.assertEqual(kept.links.untranslated().get().url, "http://sinarproject.org")
+
+    def test_merge_command(self):
+        call_command("merge_persons", str(self.first.id), self.second.id.hex, stdout=StringIO())
+        self.assertEqual(Person.objects.count(), 2)
+        with self.assertRaises(CommandError):
+            call_command("merge_persons", str(self.first.id), "nope", stdout=StringIO())
@@ -0,0 +1,91 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import six
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.documents import get_documents
+from popit.documents import person_versions
+from popit.documents import rebuild_all_documents
+from popit.models import Contact
+from popit.models import Person
+from popit.models import PersonChange
+from popit.models import PersonDocument
+from popit import cache
+
+
+class PersonDocumentTestCase(APITestCase):
+
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.person = Person.objects.language("en").get(id="8497ba86-7485-42d2-9596-2ab14520f1f4")
+
+    def test_list_reads_documents(self):
+        self.client.get("/en/persons/")
+        self.assertEqual(PersonDocument.objects.filter(language_code="en").count(), Person.objects.count())
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/en/persons/?page_size=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        tables = ("popit_othername", "popit_identifier", "popit_contact", "popit_link", "_translation")
+        for query in context.captured_queries:
+            self.assertFalse(any(table in query["sql"] for table in tables), query["sql"])
+
+    def test_document_dropped_on_change(self):
+        self.client.get("/en/persons/%s/" % self.person.id)
+        self.assertTrue(PersonDocument.objects.filter(person=self.person).exists())
+
+        contact = Contact.objects.language("en").create(type="phone", value="0123", content_object=self.person)
+        self.assertFalse(PersonDocument.objects.filter(person=self.person).exists())
+
+        response = self.client.get("/en/persons/%s/" % self.person.id)
+        self.assertIn(str(contact.id), [item["id"] for item in response.data["contacts"]])
+
+    def test_outdated_document_not_served(self):
+        contact = Contact.objects.language("en").create(type="phone", value="0123", content_object=self.person)
+        # As stored by a reader that rendered the person before the contact was committed
+        PersonDocument.objects.create(person=self.person, language_code="en", data='{"name": "Stale"}', version=0)
+
+        documents = get_documents([self.person.id], "en")
+        self.assertEqual(documents[self.person.id]["name"], "John")
+        self.assertIn(str(contact.id), [item["id"] for item in documents[self.person.id]["contacts"]])
+        document = PersonDocument.objects.get(person=self.person, language_code="en")
+        self.assertEqual(document.version, person_versions([self.person.id])[self.person.id])
+
+    def test_version_kept_when_changes_pruned(self):
+        Contact.objects.language("en").create(type="phone", value="0123", content_object=self.person)
+        version = person_versions([self.person.id])[self.person.id]
+        get_documents([self.person.id], "en")
+
+        PersonChange.objects.all().delete()
+        self.assertEqual(person_versions([self.person.id])[self.person.id], version)
+        Contact.objects.language("en").create(type="phone", value="0456", content_object=self.person)
+        self.assertGreater(person_versions([self.person.id])[self.person.id], version)
+
+    def test_document_falls_back(self):
+        documents = get_documents([self.person.id], "ms")
+        self.assertEqual(documents[self.person.id]["name"], "John")
+        self.assertTrue(PersonDocument.objects.filter(person=self.person, language_code="ms").exists())
+
+    def test_unknown_language_not_stored(self):
+        documents = get_documents([self.person.id], "fr")
+        self.assertEqual(documents[self.person.id]["id"], str(self.person.id))
+        self.assertFalse(PersonDocument.objects.filter(language_code="fr").exists())
+
+    def test_missing_person(self):
+        self.assertEqual(get_documents(["ab1a5788-e5ba-e955-c048-748fa6af0e00"], "en"), {})
+
+    def test_rebuild_all_documents(self):
+        done = sum(rebuild_all_documents(chunk_size=1, processes=1))
+        self.assertEqual(done, Person.objects.count())
+        self.assertEqual(PersonDocument.objects.count(), Person.objects.count() * 2)
+
+    def test_rebuild_documents_command(self):
+        output = six.StringIO()
+        call_command("rebuild_documents", processes=1, stdout=output)
+        self.assertEqual(output.getvalue(), "Rebuilt documents of %d persons\n" % Person.objects.count())
+        document = PersonDocument.objects.get(person=self.person, language_code="en")
+        self.assertIn('"name":"John"', document.data)
@@ -0,0 +1,54 @@
+import json
+import os
+import shutil
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.export import iter_popolo_json
+
+
+class ExportTestCase(TestCase):
+    fixtures = [ "api_test_data.yaml" ]
+
+    def test_export_all_persons(self):
+        data = json.loads("".join(iter_popolo_json("en")))
+        ids = [person["id"] for person in data["persons"]]
+        self.assertEqual(sorted(ids), ["8497ba86-7485-42d2-9596-2ab14520f1f4", "ab1a5788-e5ba-e955-c048-748fa6af0e97"])
+
+    def test_export_in_small_chunks(self):
+        data = json.loads("".join(iter_popolo_json("en", chunk_size=1)))
+        self.assertEqual(len(data["persons"]), 2)
+        john = [person for person in data["persons"] if person["id"] == "8497ba86-7485-42d2-9596-2ab14520f1f4"][0]
+        self.assertEqual(john["name"], "John")
+        self.assertTrue(john["other_names"])
+
+    def test_export_command(self):
+        output_dir = tempfile.mkdtemp()
+        try:
+            call_command("export_popolo", output_dir, languages=["en"], stdout=open(os.devnull, "w"))
+            with open(os.path.join(output_dir, "persons.en.json")) as export:
+                data = json.load(export)
+            self.assertEqual(len(data["persons"]), 2)
+            self.assertFalse(os.path.exists(os.path.join(output_dir, "persons.ms.json")))
+        finally:
+            shutil.rmtree(output_dir)
+
+
+class ExportAPITestCase(APITestCase):
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def test_view_export(self):
+        response = self.client.get("/en/export/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(b"".join(response.streaming_content).decode("utf-8"))
+        self.assertEqual(len(data["persons"]), 2)
+
+    def test_view_export_ndjson(self):
+        response = self.client.get("/en/export.ndjson/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("John", [json.loads(line)["name"] for line in lines])
@@ -0,0 +1,92 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit import cache
+from popit.fallbacks import language_chain
+from popit.fallbacks import resolve_translation
+from popit.models import Contact
+from popit.models import OtherName
+from popit.models import Person
+
+
+class LanguageChainTestCase(TestCase):
+
+    @override_settings(POPIT_LANGUAGE_FALLBACKS={"ms": ("en", "ms", "zh")})
+    def test_language_chain(self):
+        self.assertEqual(language_chain("ms"), ["ms", "en", "zh"])
+        self.assertEqual(language_chain("ta"), ["ta"])
+
+    def test_resolve_per_field(self):
+        person = Person.objects.language("en").create(name="John", summary="A politician")
+        person.translate("ms")
+        person.name = "Johan"
+        person.save()
+
+        person = Person.objects.untranslated().prefetch_related("translations").get(id=person.id)
+        with self.assertNumQueries(0):
+            translation = resolve_translation(person, ["ms", "en"])
+        self.assertEqual(translation.language_code, "ms")
+        self.assertEqual(translation.name, "Johan")
+        self.assertEqual(translation.summary, "A politician")
+
+        translation = resolve_translation(person, ["zh"])
+        self.assertEqual(translation.language_code, "zh")
+        self.assertFalse(translation.name)
+
+    def test_resolve_not_prefetched(self):
+        person = Person.objects.language("en").create(name="John")
+        person = Person.objects.untranslated().get(id=person.id)
+        with self.assertNumQueries(1):
+            translation = resolve_translation(person, ["ms", "en"])
+        self.assertEqual(translation.name, "John")
+
+
+class FallbackAPITestCase(APITestCase):
+
+    fixtures = ["api_request_test_data.yaml"]
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.person = Person.objects.language("en").create(name="John", biography="Born somewhere")
+        OtherName.objects.language("en").create(name="Johnny", content_object=self.person)
+        Contact.objects.language("en").create(type="phone", value="0123", label="office", content_object=self.person)
+
+    def test_view_person_detail_fallback(self):
+        response = self.client.get("/ms/persons/%s/" % self.person.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "John")
+        self.assertEqual(response.data["language_code"], "en")
+        self.assertEqual(response.data["other_names"][0]["name"], "Johnny")
+        self.assertEqual(response.data["contacts"][0]["label"], "office")
+
+    def test_view_person_detail_partial_translation(self):
+        self.person.translate("ms")
+        self.person.name = "Johan"
+        self.person.save()
+        response = self.client.get("/ms/persons/%s/" % self.person.id)
+        self.assertEqual(response.data["name"], "Johan")
+        self.assertEqual(response.data["language_code"], "ms")
+        self.assertEqual(response.data["biography"], "Born somewhere")
+
+    def test_view_person_detail_fallback_query_count(self):
+        with CaptureQueriesContext(connection) as translated:
+            self.client.get("/en/persons/%s/" % self.person.id)
+        cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as fallback:
+            self.client.get("/ms/persons/%s/" % self.person.id)
+        self.assertEqual(len(fallback), len(translated))
+
+    def test_view_person_list_fallback(self):
+        response = self.client.get("/ms/persons/")
+        names = [person["name"] for person in response.data["results"]]
+        self.assertIn("John", names)
+
+    def test_update_person_not_found(self):
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+        response = self.client.put("/en/persons/%s/" % ("ab" * 16), {"name": "Nobody"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
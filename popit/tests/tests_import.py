@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import six
+from popit.importer import PopoloReader
+from popit.models import Contact
+from popit.models import Person
+from popit.serializers import PersonListSerializer
+
+
+class PopoloReaderTestCase(TestCase):
+
+    def test_read_persons_from_document(self):
+        document = {
+            "organizations": [{"name": "Sinar Project", "founding_date": 2011}],
+            "persons": [{"name": "John"}, {"name": "Jane", "other_names": [{"name": "Jambul"}]}],
+            "memberships": [],
+        }
+        stream = io.StringIO(six.text_type(json.dumps(document)))
+        persons = list(PopoloReader(stream, buffer_size=7))
+        self.assertEqual([person["name"] for person in persons], ["John", "Jane"])
+        self.assertEqual(persons[1]["other_names"][0]["name"], "Jambul")
+
+    def test_read_persons_from_list(self):
+        stream = io.StringIO(u'[ {"name": "John"} , {"name": "Jane"} ]')
+        persons = list(PopoloReader(stream, buffer_size=3))
+        self.assertEqual([person["name"] for person in persons], ["John", "Jane"])
+
+
+class ImportCommandTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.devnull = open(os.devnull, "w")
+
+    def tearDown(self):
+        self.devnull.close()
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with io.open(path, "w", encoding="utf-8") as output:
+            output.write(content)
+        return path
+
+    def test_import_json(self):
+        path = self.write("persons.json", u'''{"persons": [
+            {"name": "John", "language_code": "en", "identifiers": [{"scheme": "ic", "identifier": "123", "language_code": "en"}]},
+            {"name": "Jane", "links": [{"url": "http://sinarproject.org"}]},
+            {"given_name": "no name"}
+        ]}''')
+        call_command("import_popolo", path, language="en", chunk_size=2, stdout=self.devnull, stderr=self.devnull)
+        john = Person.objects.language("en").get(name="John")
+        self.assertEqual(john.identifiers.language("en").get().identifier, "123")
+        jane = Person.objects.language("en").get(name="Jane")
+        self.assertEqual(jane.links.language("en").get().url, "http://sinarproject.org")
+        self.assertEqual(Person.objects.untranslated().count(), 2)
+
+    def test_import_errors_written_as_text(self):
+        path = self.write("persons.json", u'[{"name": "John"}, {"given_name": "no name"}]')
+        errors = six.StringIO()
+        call_command("import_popolo", path, stdout=self.devnull, stderr=errors)
+        self.assertIn("Person 1:", errors.getvalue())
+        self.assertIn("This field is required.", errors.getvalue())
+
+    def test_import_integrity_error(self):
+        person = Person.objects.language("en").create(name="Jane")
+        contact = Contact.objects.language("en").create(type="phone", value="0123", content_object=person)
+        path = self.write("persons.json", u'[{"name": "John"}, {"name": "Jim", "contacts": [%s]}, {"name": "Jack"}]' % (
+            json.dumps({"id": str(contact.id), "type": "phone", "value": "0123"})
+        ))
+        # As when the contact is written by someone else between validation and save
+        validate_ids = PersonListSerializer.__dict__["validate_ids"]
+        PersonListSerializer.validate_ids = lambda self, attrs: attrs
+        errors = six.StringIO()
+        try:
+            call_command("import_popolo", path, stdout=self.devnull, stderr=errors)
+        finally:
+            PersonListSerializer.validate_ids = validate_ids
+        self.assertEqual(sorted(person.name for person in Person.objects.language("en").all()), ["Jack", "Jane", "John"])
+        self.assertIn("Person 1:", errors.getvalue())
+
+    def test_import_csv(self):
+        path = self.write("persons.csv", u"name,given_name,identifier:ic,contact:phone,other_names,links\n"
+                                         u"Ahmad,Ahmad bin Ali,123,0123,Mat;Ahmad Ali,http://sinarproject.org\n"
+                                         u"Siti Nurhaliza,,,,,\n")
+        call_command("import_popolo", path, language="ms", stdout=self.devnull, stderr=self.devnull)
+        ahmad = Person.objects.language("ms").get(name="Ahmad")
+        self.assertEqual(ahmad.given_name, "Ahmad bin Ali")
+        self.assertEqual(ahmad.identifiers.language("ms").get().scheme, "ic")
+        self.assertEqual(ahmad.contacts.language("ms").get().value, "0123")
+        self.assertEqual(sorted(name.name for name in ahmad.other_names.language("ms").all()), ["Ahmad Ali", "Mat"])
+        self.assertTrue(Person.objects.language("ms").filter(name="Siti Nurhaliza").exists())
+
+    def test_import_resume(self):
+        path = self.write("persons.json", u'[{"name": "John"}, {"name": "Jane"}, {"name": "Jim"}]')
+        state_file = os.path.join(self.directory, "state")
+        with open(state_file, "w") as state:
+            state.write("2")
+        call_command("import_popolo", path, state_file=state_file, chunk_size=1, stdout=self.devnull)
+        self.assertEqual([person.name for person in Person.objects.language("en").all()], ["Jim"])
+        with open(state_file) as state:
+            self.assertEqual(state.read(), "3")
@@ -0,0 +1,120 @@
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import six
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.matching import match_name
+from popit.matching import match_person
+from popit.matching import name_key
+from popit import matching
+from popit.models import OtherName
+from popit.models import Person
+from popit.models import PersonNameKey
+from popit.serializers import PersonSerializer
+
+
+class NameKeyTestCase(TestCase):
+
+    def test_honorifics_dropped(self):
+        self.assertEqual(name_key("Dato' Sri Mohd. Najib bin Tun Abdul Razak"), "abdul muhammad najib razak")
+        self.assertEqual(name_key("Tan Sri Muhyiddin Yassin"), "muhyiddin yassin")
+
+    def test_surname_tan_kept(self):
+        self.assertEqual(name_key("Tan Kok Wai"), "kok tan wai")
+
+    def test_recorded_honorific_dropped(self):
+        self.assertEqual(name_key("Yang Dipertua Ahmad", honorifics=("Yang Dipertua", None)), "ahmad")
+
+    def test_folding(self):
+        self.assertEqual(name_key(u"Jos\xe9 Ramos-Horta"), name_key("jose ramos horta"))
+
+    def test_connectors(self):
+        self.assertEqual(name_key("Kulasegaran a/l Murugeson"), "kulasegaran murugeson")
+
+    def test_word_order(self):
+        self.assertEqual(name_key("Lim Guan Eng"), name_key("Guan Eng Lim"))
+
+
+class PersonMatchTestCase(APITestCase):
+
+    def setUp(self):
+        self.najib = Person.objects.language("en").create(
+            name="Dato' Sri Mohd Najib bin Tun Abdul Razak", honorific_prefix="Dato' Sri"
+        )
+        self.najib_copy = Person.objects.language("ms").create(name="Najib Razak")
+        OtherName.objects.language("ms").create(name="Muhammad Najib Abdul Razak", content_object=self.najib_copy)
+        self.lim = Person.objects.language("en").create(name="Lim Guan Eng")
+
+    def test_keys_maintained_on_save(self):
+        self.assertEqual(
+            set(PersonNameKey.objects.filter(person=self.najib_copy).values_list("key", flat=True)),
+            set(["najib razak", "abdul muhammad najib razak"])
+        )
+
+        other_name = self.najib_copy.other_names.untranslated().get()
+        other_name.delete()
+        self.assertEqual(list(PersonNameKey.objects.filter(person=self.najib_copy).values_list("key", flat=True)),
+                         ["najib razak"])
+
+    def test_keys_removed_with_person(self):
+        self.najib_copy.delete()
+        self.assertFalse(PersonNameKey.objects.filter(person_id=self.najib_copy.id).exists())
+
+    def test_keys_rebuilt_once_per_save(self):
+        calls = []
+        rebuild_name_keys = matching.rebuild_name_keys
+
+        def counting_rebuild(person_ids):
+            calls.append(set(person_ids))
+            rebuild_name_keys(person_ids)
+        matching.rebuild_name_keys = counting_rebuild
+        try:
+            serializer = PersonSerializer(data={
+                "name": "Anwar Ibrahim",
+                "other_names": [{"name": "Anwar bin Ibrahim"}, {"name": "Dato' Seri Anwar Ibrahim"}],
+                "contacts": [], "identifiers": [], "links": [],
+            }, language="en")
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            person = serializer.save()
+        finally:
+            matching.rebuild_name_keys = rebuild_name_keys
+        self.assertEqual(calls, [set([person.id])])
+        self.assertEqual(list(PersonNameKey.objects.filter(person=person).values_list("key", flat=True)),
+                         ["anwar ibrahim"])
+
+    def test_match_person(self):
+        matches = match_person(self.najib.id)
+        self.assertEqual(matches, [(self.najib_copy.id, 1.0)])
+
+    def test_match_name(self):
+        matches = match_name("Lim Guan Eng")
+        self.assertEqual(matches, [(self.lim.id, 1.0)])
+
+        matches = match_name("Lim Guang Eng")
+        self.assertEqual([person_id for person_id, score in matches], [self.lim.id])
+        self.assertTrue(matches[0][1] < 1.0)
+
+        self.assertEqual(match_name("Zulkifli"), [])
+        self.assertEqual(match_name(""), [])
+
+    def test_rebuild_command(self):
+        PersonNameKey.objects.all().delete()
+        output = six.StringIO()
+        call_command("rebuild_name_keys", stdout=output)
+        self.assertEqual(PersonNameKey.objects.filter(person=self.lim).count(), 1)
+        self.assertEqual(output.getvalue(), "Rebuilt name keys of %d persons\n" % Person.objects.count())
+
+    def test_match_api(self):
+        response = self.client.get("/en/match/persons/", {"name": "Guan Eng Lim"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["score"], 1.0)
+        self.assertEqual(response.data["results"][0]["person"]["name"], "Lim Guan Eng")
+
+    def test_match_person_api(self):
+        response = self.client.get("/en/persons/%s/matches/" % self.najib_copy.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["person"]["id"], str(self.najib.id))
+
+        response = self.client.get("/en/persons/%s/matches/" % ("ab" * 16))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
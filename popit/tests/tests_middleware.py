@@ -0,0 +1,86 @@
+import gzip
+import io
+import json
+import unittest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.middleware import best_encoding
+from popit.middleware import brotli
+from popit.models import Person
+from popit import cache
+
+
+def gunzip(content):
+    return gzip.GzipFile(fileobj=io.BytesIO(content)).read()
+
+
+class EncodingTestCase(unittest.TestCase):
+
+    variants = {"identity": b"x" * 300, "gzip": b"x" * 20, "br": b"x" * 10}
+
+    def test_best_encoding(self):
+        self.assertEqual(best_encoding(self.variants, "gzip, deflate, br"), "br")
+        self.assertEqual(best_encoding(self.variants, "gzip;q=0.5, br;q=0"), "gzip")
+        self.assertEqual(best_encoding(self.variants, "*"), "br")
+        self.assertEqual(best_encoding(self.variants, ""), "identity")
+        self.assertEqual(best_encoding({"identity": b"x"}, "gzip"), "identity")
+
+
+class CompressedResponseCacheTestCase(APITestCase):
+
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def test_gzip(self):
+        plain = self.client.get("/en/persons/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+        response = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gunzip(response.content), plain.content)
+        self.assertEqual(len(json.loads(gunzip(response.content).decode("ascii"))["results"]), 2)
+
+    def test_served_from_cache(self):
+        first = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip")
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(len(context), 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Content-Type"], "application/json")
+
+    def test_not_modified_from_cache(self):
+        first = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip")
+        response = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalidated_by_writes(self):
+        self.client.get("/en/persons/")
+        Person.objects.language("en").create(name="Jane")
+        response = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip")
+        names = [person["name"] for person in json.loads(gunzip(response.content).decode("ascii"))["results"]]
+        self.assertIn("Jane", names)
+
+    def test_formats_cached_apart(self):
+        json_response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        ndjson_response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                          HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(json_response["Content-Type"], "application/json")
+        self.assertEqual(ndjson_response["Content-Type"], "application/x-ndjson")
+
+    def test_browsable_api_not_cached(self):
+        response = self.client.get("/en/persons/", HTTP_ACCEPT="text/html", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli(self):
+        plain = self.client.get("/en/persons/")
+        response = self.client.get("/en/persons/", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), plain.content)
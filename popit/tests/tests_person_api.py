@@ -2,10 +2,20 @@ __author__ = 'sweemeng'
 from rest_framework.test import APIRequestFactory
 from rest_framework.test import APITestCase
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import modify_settings
+from django.db import connection
 from popit.models import Person
+from popit.models import Contact
+from popit.models import Link
+from popit.models import OtherName
+from popit.models import Identifier
 from popit.serializers import PersonSerializer
+from popit.signals import persons_changed
+from rest_framework.serializers import ValidationError
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from popit import cache
 
 
 # TODO: Test multilingual behavior. To make behavior clear
@@ -37,6 +47,44 @@ class PersonSerializerTestCase(TestCase):
         data = serializer.data
         self.assertFalse(data["other_names"])
 
+    def add_relations(self, person):
+        other_name = OtherName.objects.language("en").create(name="Jane", content_object=person)
+        identifier = Identifier.objects.language("en").create(identifier="12345", scheme="test", content_object=person)
+        contact = Contact.objects.language("en").create(type="phone", value="0123", content_object=person)
+        for entity in (person, other_name, identifier, contact):
+            Link.objects.language("en").create(url="http://sinarproject.org", content_object=entity)
+
+    def serialize_person(self, pk):
+        person = Person.objects.language("en").get(id=pk)
+        PersonSerializer.load_related([person])
+        return PersonSerializer(person, language="en").data
+
+    def test_person_serializer_query_count_independent_of_children(self):
+        person = Person.objects.language("en").get(id='ab1a5788e5bae955c048748fa6af0e97')
+        self.add_relations(person)
+        with CaptureQueriesContext(connection) as context:
+            self.serialize_person(person.id)
+        num_queries = len(context)
+
+        for i in range(3):
+            self.add_relations(person)
+
+        with CaptureQueriesContext(connection) as context:
+            data = self.serialize_person(person.id)
+        self.assertEqual(len(data["contacts"]), 5)
+        self.assertEqual(len(context), num_queries)
+
+    def test_person_serializer_nested_language(self):
+        contact = Contact.objects.language("en").get(id="a66cb422-eec3-4861-bae1-a64ae5dbde61")
+        contact.translate("ms")
+        contact.label = "telefon sweemeng"
+        contact.save()
+
+        person = Person.objects.language("ms").get(id='ab1a5788e5bae955c048748fa6af0e97')
+        PersonSerializer.load_related([person])
+        data = PersonSerializer(person, language="ms").data
+        self.assertEqual(data["contacts"][0]["label"], "telefon sweemeng")
+
     def test_create_person_with_all_field_serializer(self):
 
         person_data = {
@@ -98,6 +146,100 @@ class PersonSerializerTestCase(TestCase):
         person_ = Person.objects.language('en').get(id='ab1a5788e5bae955c048748fa6af0e97')
         self.assertEqual(person_.given_name, "jerry jambul")
 
+    def test_update_person_serializer_keeps_family_name(self):
+        person = Person.objects.language('en').get(id='8497ba86-7485-42d2-9596-2ab14520f1f4')
+        family_name = person.family_name
+        person_serializer = PersonSerializer(person, data={"given_name": "jerry"}, partial=True, language='en')
+        person_serializer.is_valid()
+        person_serializer.save()
+        person_ = Person.objects.language('en').get(id='8497ba86-7485-42d2-9596-2ab14520f1f4')
+        self.assertEqual(person_.family_name, family_name)
+
+    def update_contacts(self, person, contacts):
+        person = Person.objects.language("en").get(id=person.id)
+        serializer = PersonSerializer(person, data={"contacts": contacts}, partial=True, language="en")
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as context:
+            serializer.save()
+        return len(context)
+
+    def test_update_person_serializer_query_count_independent_of_children(self):
+        person = Person.objects.language("en").get(id='ab1a5788e5bae955c048748fa6af0e97')
+        contacts = [
+            Contact.objects.language("en").create(type="phone", value="0", content_object=person) for i in range(10)
+        ]
+        for contact in contacts:
+            Link.objects.language("en").create(url="http://sinarproject.org", content_object=contact)
+
+        def contacts_data(value):
+            return [
+                {"id": str(contact.id), "value": value, "label": value,
+                 "links": [{"id": str(link.id), "url": "http://sinarproject.org/%s" % value}
+                           for link in contact.links.untranslated()]}
+                for contact in contacts
+            ]
+
+        one = self.update_contacts(person, contacts_data("1")[:1])
+        many = self.update_contacts(person, contacts_data("2"))
+        self.assertEqual(one, many)
+
+        person_ = Person.objects.language("en").get(id=person.id)
+        for contact in person_.contacts.language("en").filter(id__in=[contact.id for contact in contacts]):
+            self.assertEqual(contact.value, "2")
+            self.assertEqual(contact.label, "2")
+            self.assertEqual(contact.links.untranslated().get().url, "http://sinarproject.org/2")
+
+    def test_update_person_serializer_new_and_untranslated_children(self):
+        person = Person.objects.language("en").get(id='ab1a5788e5bae955c048748fa6af0e97')
+        contact = Contact.objects.language("ms").create(type="phone", value="0", label="pejabat",
+                                                        content_object=person)
+        self.update_contacts(person, [
+            {"id": str(contact.id), "label": "office"},
+            {"type": "fax", "value": "1", "links": [{"url": "http://sinarproject.org"}]},
+        ])
+        self.assertEqual(Contact.objects.language("en").get(id=contact.id).label, "office")
+        self.assertEqual(Contact.objects.language("ms").get(id=contact.id).label, "pejabat")
+        fax = person.contacts.language("en").get(type="fax")
+        self.assertEqual(fax.links.untranslated().get().url, "http://sinarproject.org")
+
+    def test_update_person_serializer_refuses_children_of_others(self):
+        person = Person.objects.language("en").get(id='ab1a5788e5bae955c048748fa6af0e97')
+        other = Person.objects.language("en").get(id='8497ba86-7485-42d2-9596-2ab14520f1f4')
+        contact = Contact.objects.language("en").create(type="phone", value="0", content_object=other)
+        link = Link.objects.language("en").create(url="http://sinarproject.org", content_object=other)
+
+        serializer = PersonSerializer(person, data={
+            "contacts": [{"id": str(contact.id), "value": "1"}],
+            "other_names": [{"name": "Jerry", "links": [{"id": str(link.id), "url": "http://popit.sinarproject.org"}]}],
+        }, partial=True, language="en")
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.assertRaises(ValidationError) as context:
+            serializer.save()
+        self.assertEqual(set(context.exception.detail), set(["contacts", "other_names"]))
+        self.assertEqual(Contact.objects.language("en").get(id=contact.id).value, "0")
+        self.assertEqual(Link.objects.language("en").get(id=link.id).url, "http://sinarproject.org")
+        self.assertFalse(person.other_names.exists())
+
+    def test_update_person_serializer_sends_persons_changed_after_commit(self):
+        depths = []
+
+        def handler(sender, changes, **kwargs):
+            depths.append(len(connection.savepoint_ids))
+        depth = len(connection.savepoint_ids)
+        persons_changed.connect(handler)
+        try:
+            person = Person.objects.language("en").get(id='ab1a5788e5bae955c048748fa6af0e97')
+            serializer = PersonSerializer(person, data={
+                "given_name": "jerry",
+                "other_names": [{"name": "Jerry"}, {"name": "Jerry Lee"}],
+            }, partial=True, language="en")
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+        finally:
+            persons_changed.disconnect(handler)
+        # Once, and once the update's transaction is over
+        self.assertEqual(depths, [depth])
+
     def test_create_links_person_serializers(self):
         person_data = {
             "links": [
@@ -306,11 +448,125 @@ class PersonAPITestCase(APITestCase):
 
     def setUp(self):
         self.factory = APIRequestFactory()
+        cache.get_cache().clear()
 
     def test_view_person_list(self):
         response = self.client.get("/en/persons/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_view_person_list_paginated(self):
+        response = self.client.get("/en/persons/?page_size=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertTrue(response.data["next"])
+        first_id = response.data["results"][0]["id"]
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertNotEqual(response.data["results"][0]["id"], first_id)
+        self.assertFalse(response.data["next"])
+
+    def create_person_with_relations(self, name):
+        person = Person.objects.language("en").create(name=name)
+        other_name = OtherName.objects.language("en").create(name=name.upper(), content_object=person)
+        identifier = Identifier.objects.language("en").create(identifier="12345", scheme="test", content_object=person)
+        contact = Contact.objects.language("en").create(type="phone", value="0123", content_object=person)
+        for entity in (person, other_name, identifier, contact):
+            Link.objects.language("en").create(url="http://sinarproject.org", content_object=entity)
+        return person
+
+    def test_view_person_list_query_count(self):
+        self.create_person_with_relations("Jane")
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/en/persons/")
+        num_queries = len(context)
+
+        for name in ("Joe", "Jerry", "Jim"):
+            self.create_person_with_relations(name)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/en/persons/")
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(len(context), num_queries)
+
+    @modify_settings(MIDDLEWARE_CLASSES={"remove": "popit.middleware.CompressedResponseCacheMiddleware"})
+    def test_view_person_list_query_count_fallback_language(self):
+        # Persons only translated in english are listed in malay through the fallback chain
+        self.create_person_with_relations("Jane")
+        self.client.get("/ms/persons/")
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/ms/persons/")
+        num_queries = len(context)
+
+        for name in ("Joe", "Jerry", "Jim"):
+            self.create_person_with_relations(name)
+
+        self.client.get("/ms/persons/")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/ms/persons/")
+        names = [person["name"] for person in response.data["results"]]
+        self.assertIn("Jim", names)
+        self.assertEqual(len(context), num_queries)
+
+    def test_view_person_list_translations_in_requested_languages(self):
+        self.create_person_with_relations("Jane")
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/en/persons/")
+        translation_queries = [
+            query["sql"] for query in context.captured_queries if "_translation" in query["sql"].split("WHERE")[0]
+        ]
+        # The person, its four kinds of children and the links of the person and of three of them
+        self.assertEqual(len(translation_queries), 8)
+        for sql in translation_queries:
+            self.assertIn("language_code", sql.split("WHERE")[-1], sql)
+
+    @modify_settings(MIDDLEWARE_CLASSES={"remove": "popit.middleware.CompressedResponseCacheMiddleware"})
+    def test_view_person_list_fields(self):
+        self.create_person_with_relations("Jane")
+        # Warm up the ETag freshness, it covers every table
+        self.client.get("/en/persons/?fields=id,name,image")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/en/persons/?fields=id,name,image")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for person in response.data["results"]:
+            self.assertEqual(set(person.keys()), set(["id", "name", "image"]))
+        tables = ("popit_othername", "popit_identifier", "popit_contact", "popit_link")
+        for query in context.captured_queries:
+            self.assertFalse(any(table in query["sql"] for table in tables), query["sql"])
+
+    @modify_settings(MIDDLEWARE_CLASSES={"remove": "popit.middleware.CompressedResponseCacheMiddleware"})
+    def test_view_person_list_expand(self):
+        self.create_person_with_relations("Jane")
+        self.client.get("/en/persons/?expand=contacts")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/en/persons/?expand=contacts")
+        person = [person for person in response.data["results"] if person["name"] == "Jane"][0]
+        self.assertEqual(len(person["contacts"]), 1)
+        self.assertEqual(person["contacts"][0]["value"], "0123")
+        self.assertIn("given_name", person)
+        self.assertNotIn("links", person)
+        self.assertNotIn("other_names", person)
+        for query in context.captured_queries:
+            self.assertNotIn("popit_identifier", query["sql"])
+
+        response = self.client.get("/en/persons/?fields=id&expand=identifiers")
+        for person in response.data["results"]:
+            self.assertEqual(set(person.keys()), set(["id", "identifiers"]))
+
+    def test_view_person_detail_fields(self):
+        url = "/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/"
+        response = self.client.get(url, {"fields": "id,name,other_names"})
+        self.assertEqual(set(response.data.keys()), set(["id", "name", "other_names"]))
+        self.assertTrue(response.data["other_names"])
+        # The whole person is cached, not the sparse response
+        pk = "8497ba86-7485-42d2-9596-2ab14520f1f4"
+        self.assertIn("biography", cache.get_person_detail(cache.person_generation(pk), "en", pk))
+
+        self.client.get(url)
+        response = self.client.get(url, {"fields": "name", "expand": "links"})
+        self.assertEqual(set(response.data.keys()), set(["name", "links"]))
+
     def test_view_person_detail(self):
         person = Person.objects.language("en").get(id="8497ba86-7485-42d2-9596-2ab14520f1f4")
         response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
@@ -318,6 +574,76 @@ class PersonAPITestCase(APITestCase):
         data = response.data
         self.assertEqual(data["name"], "John")
 
+    def test_view_person_detail_all_languages(self):
+        person = Person.objects.language("en").get(id="8497ba86-7485-42d2-9596-2ab14520f1f4")
+        person.translate("ms")
+        person.name = "Johan"
+        person.save()
+        for other_name in person.other_names.language("en").all():
+            other_name.translate("ms")
+            other_name.save()
+        for model in (Identifier, Contact, Link):
+            for child in model.objects.language("en").all():
+                child.translate("ms")
+                child.save()
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/all/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.keys()), ["en", "ms"])
+        self.assertEqual(response.data["en"]["name"], "John")
+        self.assertEqual(response.data["ms"]["name"], "Johan")
+        self.assertEqual(response.data["ms"]["language_code"], "ms")
+        self.assertEqual(len(response.data["ms"]["other_names"]), len(response.data["en"]["other_names"]))
+
+        cache.get_cache().clear()
+        with CaptureQueriesContext(connection) as one_language:
+            self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        # Both languages cost what rendering one does, the single language also goes through its document
+        documents = ("popit_persondocument", '"popit_person"."id", "popit_person"."version"', "SAVEPOINT")
+        rendering = [query for query in one_language.captured_queries
+                     if not any(table in query["sql"] for table in documents)]
+        self.assertEqual(len(context), len(rendering))
+
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/", {"languages": "ms"})
+        self.assertEqual(list(response.data.keys()), ["ms"])
+        self.assertEqual(response.data["ms"]["name"], "Johan")
+
+    def test_view_person_detail_languages_untranslated(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                   {"languages": "en,ms", "fields": "name"})
+        self.assertEqual(response.data, {"en": {"name": "John"}})
+
+        response = self.client.get("/all/persons/%s/" % ("ab" * 16))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_view_person_detail_all_languages_after_fallback(self):
+        cold = self.client.get("/all/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        cache.get_cache().clear()
+        # Caches a fallback rendering for a language the person is not translated in
+        self.client.get("/ms/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        warm = self.client.get("/all/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/")
+        self.assertEqual(list(cold.data.keys()), ["en"])
+        self.assertEqual(list(warm.data.keys()), ["en"])
+
+    def test_view_person_detail_dashed_id(self):
+        response = self.client.get("/en/persons/ab1a5788-e5ba-e955-c048-748fa6af0e97/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], "ab1a5788-e5ba-e955-c048-748fa6af0e97")
+
+    def test_view_person_detail_invalid_id(self):
+        response = self.client.get("/en/persons/not-a-person/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_contact_invalid_id(self):
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.put("/en/persons/ab1a5788e5bae955c048748fa6af0e97/", {
+            "contacts": [{"id": "not-a-contact", "value": "0123421222"}]
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.credentials()
+
     def test_create_person_unauthorized(self):
         person_data = {
             "name": "joe",
@@ -410,6 +736,138 @@ class PersonAPITestCase(APITestCase):
         self.assertEqual(person.name, "joe")
         self.client.credentials()
 
+    def test_bulk_create_persons_authorized(self):
+        persons_data = [
+            {
+                "name": "joe",
+                "given_name": "joe jambul",
+                "contacts": [
+                    {
+                        "type": "twitter",
+                        "value": "sinarproject",
+                        "links": [
+                            {
+                                "url": "http://twitter.com/sinarproject",
+                                "note": "twitter page",
+                            }
+                        ]
+                    }
+                ],
+                "identifiers": [
+                    {
+                        "identifier": "9089098098",
+                        "scheme": "rakyat",
+                    }
+                ],
+            },
+            {
+                "name": "jane",
+                "other_names": [
+                    {
+                        "name": "Jane Jambul",
+                    }
+                ],
+                "links": [
+                    {
+                        "url": "http://sinarproject.org",
+                    }
+                ],
+            },
+        ]
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.post("/en/persons/", persons_data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([person["name"] for person in response.data], ["joe", "jane"])
+
+        joe = Person.objects.language("en").get(name="joe")
+        self.assertEqual(joe.given_name, "joe jambul")
+        contact = joe.contacts.language("en").get(type="twitter")
+        link = contact.links.language("en").get(url="http://twitter.com/sinarproject")
+        self.assertEqual(link.note, "twitter page")
+        self.assertEqual(joe.identifiers.language("en").get(identifier="9089098098").scheme, "rakyat")
+
+        jane = Person.objects.language("en").get(name="jane")
+        self.assertEqual(jane.other_names.language("en").get().name, "Jane Jambul")
+        self.assertEqual(jane.links.language("en").get().url, "http://sinarproject.org")
+        self.client.credentials()
+
+    def test_bulk_create_persons_invalid_item(self):
+        persons_data = [
+            {
+                "name": "joe",
+            },
+            {
+                "given_name": "no name",
+            },
+        ]
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.post("/en/persons/", persons_data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertTrue("name" in response.data[1])
+        self.assertFalse(Person.objects.language("en").filter(name="joe").exists())
+        self.client.credentials()
+
+    def test_bulk_create_persons_query_count(self):
+        def persons_data(count, prefix):
+            return [
+                {
+                    "name": "%s %d" % (prefix, i),
+                    "other_names": [{"name": "%s %d" % (prefix, i)}],
+                    "contacts": [{"type": "phone", "value": "0123", "links": [{"url": "http://sinarproject.org"}]}],
+                }
+                for i in range(count)
+            ]
+
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.post("/en/persons/", persons_data(5, "joe"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.post("/en/persons/", persons_data(50, "jane"))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(len(few), len(many))
+        self.client.credentials()
+
+    def test_bulk_create_persons_taken_ids(self):
+        persons_data = [
+            {
+                "id": "6b2d5cb4-4c4d-4a3a-9a53-1b6b2f0d7a01",
+                "name": "joe",
+            },
+            {
+                "id": "6b2d5cb4-4c4d-4a3a-9a53-1b6b2f0d7a01",
+                "name": "jane",
+            },
+            {
+                "name": "jack",
+                "contacts": [
+                    {
+                        "type": "phone",
+                        "value": "0123",
+                        "links": [{"id": "a4ffa24a9ef3cbcb8cfaa178c9329367", "url": "http://sinarproject.org"}],
+                    }
+                ],
+            },
+            {
+                "name": "jill",
+            },
+        ]
+        token = Token.objects.get(user__username="admin")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.post("/en/persons/", persons_data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(list(response.data[1].keys()), ["id"])
+        self.assertEqual(list(response.data[2].keys()), ["contacts"])
+        self.assertEqual(response.data[3], {})
+        self.assertFalse(Person.objects.language("en").filter(name="joe").exists())
+        self.client.credentials()
+
     def test_update_person_unauthorized(self):
         person_data = {
             "given_name": "jerry jambul",
@@ -0,0 +1,86 @@
+import json
+import unittest
+from collections import OrderedDict
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.renderers import FastJSONRenderer
+from popit.renderers import MessagePackRenderer
+from popit.renderers import NDJSONRenderer
+from popit.renderers import msgpack
+from popit import cache
+import datetime
+import uuid
+
+
+class RendererTestCase(unittest.TestCase):
+
+    data = OrderedDict([
+        ("id", uuid.UUID("8497ba86-7485-42d2-9596-2ab14520f1f4")),
+        ("name", u"Dato\u2019 Sri Najib \u00e9\u2028"),
+        ("updated_at", datetime.datetime(2015, 10, 6, 1, 2, 3)),
+        ("links", [OrderedDict([("url", "http://sinarproject.org"), ("note", None)])]),
+    ])
+
+    def test_fast_json_same_as_drf(self):
+        fast = FastJSONRenderer().render(self.data)
+        self.assertEqual(json.loads(fast.decode("ascii"), object_pairs_hook=OrderedDict),
+                         json.loads(JSONRenderer().render(self.data).decode("utf-8"), object_pairs_hook=OrderedDict))
+
+    def test_fast_json_indent(self):
+        rendered = FastJSONRenderer().render(self.data, "application/json; indent=4")
+        self.assertEqual(rendered, JSONRenderer().render(self.data, "application/json; indent=4"))
+
+    def test_ndjson_list(self):
+        page = OrderedDict([("next", None), ("previous", None), ("results", [self.data, self.data])])
+        lines = NDJSONRenderer().render(page).decode("ascii").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])["name"], self.data["name"])
+
+    def test_ndjson_object(self):
+        lines = NDJSONRenderer().render(self.data).decode("ascii").splitlines()
+        self.assertEqual(len(lines), 1)
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        data = msgpack.unpackb(MessagePackRenderer().render(self.data), encoding="utf-8")
+        self.assertEqual(data["id"], str(self.data["id"]))
+        self.assertEqual(data["name"], self.data["name"])
+
+
+class RendererAPITestCase(APITestCase):
+
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def test_json_suffix(self):
+        response = self.client.get("/en/persons.json/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(len(json.loads(response.content.decode("ascii"))["results"]), 2)
+
+    def test_ndjson_suffix(self):
+        response = self.client.get("/en/persons.ndjson/", {"page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = response.content.decode("ascii").splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("name", json.loads(lines[0]))
+        self.assertIn('rel="next"', response["Link"])
+
+    def test_ndjson_accept(self):
+        response = self.client.get("/en/persons/8497ba86-7485-42d2-9596-2ab14520f1f4/",
+                                   HTTP_ACCEPT="application/x-ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(json.loads(response.content.decode("ascii"))["name"], "John")
+
+    def test_unknown_suffix(self):
+        response = self.client.get("/en/persons.xml/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @unittest.skipIf(msgpack is not None, "msgpack is installed")
+    def test_msgpack_not_offered(self):
+        response = self.client.get("/en/persons.msgpack/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,61 @@
+import json
+from django.core.management import call_command
+from django.utils.six import StringIO
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.utils.encoders import JSONEncoder
+from popit.models import Contact
+from popit.models import Identifier
+from popit.models import Link
+from popit.models import OtherName
+from popit.models import Person
+from popit.rendering import render_persons
+from popit.serializers import PersonSerializer
+
+
+class RenderPersonsTestCase(TestCase):
+
+    fixtures = [ "api_request_test_data.yaml" ]
+
+    def setUp(self):
+        person = Person.objects.language("en").create(name="Jane", family_name="Doe", birth_date="1970-01-01")
+        person.translate("ms")
+        person.name = "Janet"
+        person.family_name = ""
+        person.save()
+        other_name = OtherName.objects.language("en").create(name="JANE", content_object=person)
+        identifier = Identifier.objects.language("ms").create(identifier="12345", scheme="mykad", content_object=person)
+        contact = Contact.objects.language("en").create(type="phone", value="0123", label="home", content_object=person)
+        for entity in (person, other_name, identifier, contact, contact):
+            Link.objects.language("en").create(url="http://sinarproject.org", note="source", content_object=entity)
+        self.person_ids = list(Person.objects.values_list("id", flat=True))
+
+    def serializer_output(self, language):
+        persons = list(PersonSerializer.setup_eager_loading(Person.objects.untranslated().filter(id__in=self.person_ids)))
+        data = PersonSerializer(persons, many=True, language=language).data
+        return dict((person.id, json.dumps(item, cls=JSONEncoder)) for person, item in zip(persons, data))
+
+    def test_same_output_as_serializer(self):
+        for language in ("en", "ms", "fr"):
+            rendered = render_persons(self.person_ids, [language])
+            expected = self.serializer_output(language)
+            self.assertEqual(set(person_id for person_id, code in rendered), set(expected))
+            for person_id, output in expected.items():
+                self.assertEqual(json.dumps(rendered[(person_id, language)], cls=JSONEncoder), output)
+
+    def test_languages_share_one_read(self):
+        with CaptureQueriesContext(connection) as one_language:
+            render_persons(self.person_ids, ["en"])
+        with CaptureQueriesContext(connection) as both_languages:
+            rendered = render_persons(self.person_ids, ["en", "ms"])
+        self.assertEqual(len(both_languages), len(one_language))
+        self.assertEqual(len(rendered), len(self.person_ids) * 2)
+
+    def test_missing_person(self):
+        self.assertEqual(render_persons(["ab1a5788-e5ba-e955-c048-748fa6af0e00"], ["en"]), {})
+
+    def test_benchmark_command(self):
+        output = StringIO()
+        call_command("benchmark_rendering", persons=2, repeat=1, language="ms", stdout=output)
+        self.assertIn("Output is identical", output.getvalue())
@@ -0,0 +1,98 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from popit.models import Person
+from popit.models import OtherName
+from popit.models import Identifier
+from popit.search import count_person_matches
+from popit.search import search_person_ids
+from popit.search import identifier_person_ids
+
+
+class PersonSearchTestCase(APITestCase):
+
+    def setUp(self):
+        self.ahmad = Person.objects.language("en").create(name="Ahmad bin Ali", given_name="Ahmad", family_name="Ali")
+        self.ahmad.translate("ms")
+        self.ahmad.name = "Ahmad Ali"
+        self.ahmad.save()
+        OtherName.objects.language("en").create(name="Mat Rempit", content_object=self.ahmad)
+        Identifier.objects.language("en").create(identifier="P123", scheme="spr", content_object=self.ahmad)
+
+        self.siti = Person.objects.language("en").create(name="Siti Aminah", family_name="Ali")
+
+    def test_search_name(self):
+        self.assertEqual(search_person_ids("siti"), [self.siti.id])
+
+    def test_search_every_term(self):
+        self.assertEqual(search_person_ids("ahmad ali"), [self.ahmad.id])
+
+    def test_search_ranking(self):
+        self.assertEqual(search_person_ids("ali")[0], self.ahmad.id)
+        self.assertEqual(set(search_person_ids("ali")), set([self.ahmad.id, self.siti.id]))
+
+    def test_search_other_name(self):
+        self.assertEqual(search_person_ids("rempit"), [self.ahmad.id])
+
+    def test_search_identifier(self):
+        self.assertEqual(search_person_ids("P123"), [self.ahmad.id])
+
+    def test_search_nothing(self):
+        self.assertEqual(search_person_ids("  "), [])
+        self.assertEqual(search_person_ids("nobody"), [])
+
+    def test_search_page(self):
+        ranked = search_person_ids("ali")
+        self.assertEqual(search_person_ids("ali", limit=1), ranked[:1])
+        self.assertEqual(search_person_ids("ali", limit=1, offset=1), ranked[1:2])
+        self.assertEqual(count_person_matches("ali"), 2)
+        self.assertEqual(count_person_matches(" "), 0)
+
+    def test_search_api(self):
+        response = self.client.get("/en/search/persons/", {"q": "rempit"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["name"], "Ahmad bin Ali")
+
+    def test_search_api_paginated(self):
+        response = self.client.get("/en/search/persons/", {"q": "ali", "limit": 1})
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertTrue(response.data["next"])
+        self.assertEqual(response.data["results"][0]["id"], str(self.ahmad.id))
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([person["id"] for person in response.data["results"]], [str(self.siti.id)])
+
+
+class IdentifierLookupTestCase(APITestCase):
+
+    def setUp(self):
+        self.person = Person.objects.language("en").create(name="Lim Kit Siang")
+        identifier = Identifier.objects.language("en").create(identifier="Q7077", scheme="wikidata",
+                                                              content_object=self.person)
+        identifier.translate("ms")
+        identifier.scheme = "wikidata-ms"
+        identifier.save()
+
+    def test_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(identifier_person_ids("wikidata", "Q7077", "en"), [self.person.id])
+        self.assertEqual(identifier_person_ids("wikidata-ms", "Q7077", "ms"), [self.person.id])
+        self.assertEqual(identifier_person_ids("wikidata", "Q7077", "ms"), [])
+
+    def test_lookup_api(self):
+        response = self.client.get("/en/identifiers/wikidata/Q7077/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], str(self.person.id))
+        self.assertEqual(response.data["name"], "Lim Kit Siang")
+
+    def test_lookup_api_not_found(self):
+        response = self.client.get("/en/identifiers/wikidata/Q1/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lookup_api_duplicates(self):
+        duplicate = Person.objects.language("en").create(name="Kit Siang Lim")
+        Identifier.objects.language("en").create(identifier="Q7077", scheme="wikidata", content_object=duplicate)
+        response = self.client.get("/en/identifiers/wikidata/Q7077/")
+        self.assertEqual(response.status_code, status.HTTP_300_MULTIPLE_CHOICES)
+        self.assertEqual(len(response.data["results"]), 2)
@@ -0,0 +1,79 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from popit.models import Contact
+from popit.models import Person
+from popit.signals import person_changed
+
+
+class TrackChangesTestCase(TestCase):
+
+    def setUp(self):
+        person = Person.objects.language("en").create(name="John", email="john@example.com")
+        self.person = Person.objects.language("en").get(id=person.id)
+        self.changes = []
+        person_changed.connect(self.changed, dispatch_uid="tests_tracking")
+
+    def tearDown(self):
+        person_changed.disconnect(dispatch_uid="tests_tracking")
+
+    def changed(self, sender, person_id, **kwargs):
+        self.changes.append(person_id)
+
+    def person_writes(self, context):
+        # Signal receivers read and write elsewhere, only writes to person tables matter here. Sending the
+        # change moves the version of the person, that is not the save writing.
+        tables = ('UPDATE "popit_person"', 'UPDATE "popit_person_translation"',
+                  'INSERT INTO "popit_person"', 'INSERT INTO "popit_person_translation"')
+        return [query["sql"] for query in context.captured_queries
+                if any(table in query["sql"] for table in tables)
+                and 'SET "version"' not in query["sql"]]
+
+    def test_save_without_changes(self):
+        updated_at = self.person.updated_at
+        with self.assertNumQueries(0):
+            self.person.save()
+        self.assertEqual(self.changes, [])
+        self.assertEqual(Person.objects.untranslated().get(id=self.person.id).updated_at, updated_at)
+
+    def test_save_shared_field(self):
+        self.person.email = "johnny@example.com"
+        with CaptureQueriesContext(connection) as context:
+            self.person.save()
+        sql = self.person_writes(context)
+        self.assertEqual(len(sql), 1)
+        self.assertIn("email", sql[0])
+        self.assertNotIn("translation", sql[0])
+        self.assertEqual(Person.objects.language("en").get(id=self.person.id).email, "johnny@example.com")
+
+        with self.assertNumQueries(0):
+            self.person.save()
+
+    def test_save_translated_field(self):
+        self.person.name = "Johnny"
+        with CaptureQueriesContext(connection) as context:
+            self.person.save()
+        sql = self.person_writes(context)
+        self.assertEqual(len(sql), 2)
+        # The master only moves updated_at
+        self.assertNotIn("email", sql[0])
+        self.assertIn("updated_at", sql[0])
+        self.assertIn('UPDATE "popit_person_translation"', sql[1])
+        self.assertEqual(Person.objects.language("en").get(id=self.person.id).name, "Johnny")
+        self.assertEqual(self.changes, [self.person.id, self.person.id])
+
+    def test_save_new_translation(self):
+        self.person.translate("ms")
+        self.person.name = "Johan"
+        self.person.save()
+        self.assertEqual(Person.objects.language("ms").get(id=self.person.id).name, "Johan")
+        self.assertEqual(Person.objects.language("en").get(id=self.person.id).name, "John")
+
+    def test_save_child(self):
+        contact = Contact.objects.language("en").create(type="phone", value="0", content_object=self.person)
+        contact = Contact.objects.language("en").get(id=contact.id)
+        with self.assertNumQueries(0):
+            contact.save()
+        contact.value = "1"
+        contact.save()
+        self.assertEqual(Contact.objects.language("en").get(id=contact.id).value, "1")
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six.moves import BaseHTTPServer
+from popit import webhooks
+from popit.models import Person
+from popit.webhooks import WebhookDispatcher
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            status = server.statuses.pop(0) if server.statuses else 200
+            if status == 200:
+                server.received.append(json.loads(body.decode("utf-8")))
+            server.attempts += 1
+        time.sleep(server.delay)
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookStub(BaseHTTPServer.HTTPServer):
+    """
+    Local partner recording what it receives. statuses are answered in turn, then 200.
+    """
+
+    def __init__(self, statuses=(), delay=0):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.received = []
+        self.attempts = 0
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d/hook" % self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def changes(self):
+        return [change for payload in self.received for change in payload["changes"]]
+
+
+class WebhookDispatcherTestCase(TestCase):
+
+    def start(self, statuses=(), delay=0, **options):
+        stub = WebhookStub(statuses, delay)
+        self.addCleanup(stub.stop)
+        options.setdefault("window", 60)
+        dispatcher = WebhookDispatcher([stub.url], **options)
+        self.addCleanup(dispatcher.stop)
+        return stub, dispatcher
+
+    def test_coalesce(self):
+        stub, dispatcher = self.start()
+        dispatcher.notify("a", "created")
+        dispatcher.notify("a", "updated")
+        dispatcher.notify("b", "updated")
+        dispatcher.notify("b", "deleted")
+        dispatcher.notify("c", "updated")
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(stub.received, [{"changes": [
+            {"person": "a", "action": "created"},
+            {"person": "b", "action": "deleted"},
+            {"person": "c", "action": "updated"},
+        ]}])
+
+    def test_batches(self):
+        stub, dispatcher = self.start(batch_size=2)
+        for person_id in "abcde":
+            dispatcher.notify(person_id, "updated")
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(sorted(len(payload["changes"]) for payload in stub.received), [1, 2, 2])
+        self.assertEqual(sorted(change["person"] for change in stub.changes()), list("abcde"))
+
+    def test_window(self):
+        stub, dispatcher = self.start(window=0.05)
+        dispatcher.notify("a", "updated")
+        deadline = time.time() + 5
+        while not stub.received and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(stub.changes(), [{"person": "a", "action": "updated"}])
+
+    def test_retry_with_backoff(self):
+        stub, dispatcher = self.start(statuses=[500, 503], backoff=0.01)
+        dispatcher.notify("a", "updated")
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(stub.attempts, 3)
+        self.assertEqual(stub.changes(), [{"person": "a", "action": "updated"}])
+
+    def test_give_up(self):
+        stub, dispatcher = self.start(statuses=[500] * 10, backoff=0.01, max_retries=2)
+        dispatcher.notify("a", "updated")
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(stub.attempts, 3)
+        self.assertEqual(stub.received, [])
+
+    def test_no_retry_on_client_error(self):
+        stub, dispatcher = self.start(statuses=[400], backoff=0.01)
+        dispatcher.notify("a", "updated")
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(stub.attempts, 1)
+
+    def test_bounded(self):
+        stub, dispatcher = self.start(delay=0.2, workers=1, queue_size=1, batch_size=1)
+        start = time.time()
+        for person_id in "abcd":
+            dispatcher.notify(person_id, "updated")
+            dispatcher.flush()
+        # Neither notify nor flush waits for the slow partner
+        self.assertTrue(time.time() - start < 0.2)
+        self.assertTrue(dispatcher.dropped >= 2)
+        self.assertTrue(dispatcher.join(5))
+        self.assertEqual(len(stub.changes()) + dispatcher.dropped, 4)
+
+
+class WebhookSignalTestCase(TestCase):
+
+    def test_person_changes_are_posted(self):
+        stub = WebhookStub()
+        self.addCleanup(stub.stop)
+        self.addCleanup(webhooks.stop_dispatcher)
+        with override_settings(POPIT_WEBHOOKS=[stub.url], POPIT_WEBHOOK_OPTIONS={"window": 60}):
+            person = Person.objects.language("en").create(name="John")
+            person.name = "Johnny"
+            person.save()
+            self.assertTrue(webhooks.get_dispatcher().join(5))
+        self.assertEqual(stub.changes(), [{"person": str(person.id), "action": "created"}])
+
+    def test_no_webhooks(self):
+        self.assertIsNone(webhooks.get_dispatcher())
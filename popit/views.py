@@ -2,9 +2,61 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from collections import OrderedDict
 from django.http import Http404
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from popit.serializers import PersonSerializer
+from popit.serializers import select_fields
+from popit.fallbacks import language_chain
 from popit.models import Person
+from popit.pagination import PersonCursorPagination
+from popit.pagination import SearchPagination
+from popit.search import SearchResults
+from popit.search import load_persons
+from popit.search import identifier_person_ids
+from popit.matching import match_name
+from popit.matching import match_person
+from popit.export import iter_popolo_json
+from popit.export import iter_popolo_ndjson
+from popit.renderers import NDJSONRenderer
+from popit.documents import get_documents
+from popit.documents import person_uuid
+from popit.changes import iter_changes
+from popit.changes import FEED_LIMIT
+from popit.changes import MAX_FEED_LIMIT
+from popit.signals import deferred_person_changes
+from popit import cache
+from popit import conditional
+
+
+# Language of the url asking for every language at once, see PersonDetail.get_bundle
+ALL_LANGUAGES = "all"
+
+
+def query_list(request, name):
+    """
+    A comma separated query parameter as a list, None when it is not given
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def field_selection(request):
+    """
+    ?fields= and ?expand= as keyword arguments of PersonSerializer
+    """
+    return {"fields": query_list(request, "fields"), "expand": query_list(request, "expand")}
+
+
+def select_data(data, selection):
+    """
+    The fields of a rendered person kept by a field_selection
+    """
+    return OrderedDict((name, data[name]) for name in select_fields(data.keys(), **selection))
 
 
 # Create your views here.
@@ -13,14 +65,23 @@ class PersonList(APIView):
     permission_classes = (
         IsAuthenticatedOrReadOnly,
     )
+    cache_responses = True
 
+    @method_decorator(condition(etag_func=conditional.persons_etag,
+                                last_modified_func=conditional.persons_last_modified))
     def get(self, request, language, format=None):
-        persons = Person.objects.untranslated().all()
-        serializer = PersonSerializer(persons, many=True, language=language)
-        return Response(serializer.data)
+        selection = field_selection(request)
+        paginator = PersonCursorPagination()
+        page = paginator.paginate_queryset(Person.objects.untranslated().all(), request, view=self)
+        # The page only gives the order, persons are read from their documents
+        documents = get_documents([person.id for person in page], language)
+        data = [select_data(documents[person.id], selection) for person in page if person.id in documents]
+        return paginator.get_paginated_response(data)
 
     def post(self, request, language, format=None):
-        serializer = PersonSerializer(data=request.data, language=language)
+        # A list of persons is created in bulk, and nothing is written if any of them is invalid
+        many = isinstance(request.data, list)
+        serializer = PersonSerializer(data=request.data, many=many, language=language)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -32,18 +93,74 @@ class PersonDetail(APIView):
     permission_classes = (
         IsAuthenticatedOrReadOnly,
     )
+    cache_responses = True
 
     def get_object(self, pk, language):
         try:
             return Person.objects.language(language).get(id=pk)
         except Person.DoesNotExist:
-            return Http404
+            raise Http404
 
+    @method_decorator(condition(etag_func=conditional.person_etag,
+                                last_modified_func=conditional.person_last_modified))
     def get(self, request, language, pk, format=None):
-        person = self.get_object(pk, language)
+        selection = field_selection(request)
+        languages = query_list(request, "languages")
+        if language == ALL_LANGUAGES:
+            languages = cache.cached_languages()
+        if languages is not None:
+            return Response(self.get_bundle(pk, languages, selection))
+
+        generation = cache.person_generation(pk)
+        data = cache.get_person_detail(generation, language, pk)
+        if data is None:
+            data = get_documents([pk], language).get(person_uuid(pk))
+            if data is None:
+                raise Http404
+            cache.set_person_detail(generation, language, pk, data)
+        # The whole person is stored, a sparse fieldset is cut out of it
+        return Response(select_data(data, selection))
+
+    def get_bundle(self, pk, languages, selection):
+        """
+        The person in each of languages it is translated in, keyed by language. Languages that are not
+        cached are rendered from a single load of the person with the translations of every language.
+        """
+        sparse = selection["fields"] is not None or selection["expand"] is not None
+        generation = cache.person_generation(pk)
+        bundle = OrderedDict()
+        missing = []
+        for language in languages:
+            data = None if sparse else cache.get_person_detail(generation, language, pk)
+            if data is None:
+                missing.append(language)
+            bundle[language] = data
 
-        serializer = PersonSerializer(person, language=language)
-        return Response(serializer.data)
+        translated = set()
+        if missing:
+            relations = PersonSerializer.selected_relations(**selection)
+            chains = set(code for language in missing for code in language_chain(language))
+            persons = PersonSerializer.setup_eager_loading(
+                Person.objects.untranslated().filter(id=pk), relations, sorted(chains)
+            )
+            person = next(iter(persons), None)
+            if person is None:
+                raise Http404
+            translated.update(translation.language_code for translation in person.translations.all())
+            for language in missing:
+                if language not in translated:
+                    continue
+                bundle[language] = PersonSerializer(person, language=language, **selection).data
+                if not sparse:
+                    cache.set_person_detail(generation, language, pk, bundle[language])
+
+        # The cache also holds fallback renderings, of languages the person may not be translated in
+        cached = [language for language in languages if language not in missing]
+        if cached:
+            translated.update(Person._meta.translations_model.objects.filter(
+                master_id=pk, language_code__in=cached
+            ).values_list("language_code", flat=True))
+        return OrderedDict((language, data) for language, data in bundle.items() if language in translated)
 
     def put(self, request, language, pk, format=None):
         person = self.get_object(pk, language)
@@ -55,5 +172,125 @@ class PersonDetail(APIView):
 
     def delete(self, request, language, pk, format=None):
         person = self.get_object(pk, language)
-        person.delete()
+        # The cascade sends a change per deleted row, listeners get them as one
+        with deferred_person_changes():
+            person.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PersonExport(APIView):
+
+    permission_classes = (
+        IsAuthenticatedOrReadOnly,
+    )
+
+    def get(self, request, language, format=None):
+        # Rendered piece by piece so the whole dataset is never held in memory
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return StreamingHttpResponse(iter_popolo_ndjson(language), content_type=NDJSONRenderer.media_type)
+        return StreamingHttpResponse(iter_popolo_json(language), content_type="application/json")
+
+
+class PersonSearch(APIView):
+
+    permission_classes = (
+        IsAuthenticatedOrReadOnly,
+    )
+    cache_responses = True
+
+    def get(self, request, language, format=None):
+        paginator = SearchPagination()
+        # Only the ids of the page are read, the total is counted apart
+        page = paginator.paginate_queryset(SearchResults(request.query_params.get("q", "")), request, view=self)
+        persons = load_persons(page, PersonSerializer.setup_eager_loading(
+            Person.objects.untranslated(), languages=language_chain(language)
+        ))
+        serializer = PersonSerializer(persons, many=True, language=language)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class IdentifierLookup(APIView):
+    """
+    The person holding an identifier. Duplicates sharing it are all returned with 300 Multiple Choices.
+    """
+
+    permission_classes = (
+        IsAuthenticatedOrReadOnly,
+    )
+    cache_responses = True
+
+    def get(self, request, language, scheme, identifier, format=None):
+        person_ids = identifier_person_ids(scheme, identifier, language)
+        if not person_ids:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        persons = load_persons(person_ids, PersonSerializer.setup_eager_loading(
+            Person.objects.untranslated(), languages=language_chain(language)
+        ))
+        serializer = PersonSerializer(persons, many=True, language=language)
+        if len(persons) == 1:
+            return Response(serializer.data[0])
+        return Response({"results": serializer.data}, status=status.HTTP_300_MULTIPLE_CHOICES)
+
+
+class PersonMatch(APIView):
+    """
+    Persons whose names are close to ?name=, or to the names of the person in the url when there is one.
+    """
+
+    permission_classes = (
+        IsAuthenticatedOrReadOnly,
+    )
+    cache_responses = True
+
+    MAX_LIMIT = 50
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return 10
+        return max(1, min(limit, self.MAX_LIMIT))
+
+    def get(self, request, language, pk=None, format=None):
+        limit = self.get_limit(request)
+        if pk is not None:
+            if not Person.objects.filter(id=pk).exists():
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            matches = match_person(pk, limit=limit)
+        else:
+            matches = match_name(request.query_params.get("name", ""), limit=limit)
+
+        person_ids = [person_id for person_id, score in matches]
+        persons = load_persons(person_ids, PersonSerializer.setup_eager_loading(
+            Person.objects.untranslated(), languages=language_chain(language)
+        ))
+        serializer = PersonSerializer(persons, many=True, language=language)
+        scores = dict(matches)
+        results = [
+            {"score": round(scores[person.id], 3), "person": data}
+            for person, data in zip(persons, serializer.data)
+        ]
+        return Response({"results": results})
+
+
+class ChangeFeed(APIView):
+    """
+    Changes after ?since=, the cursor of the last change seen, oldest first. Poll again with the
+    returned cursor.
+    """
+
+    permission_classes = (
+        IsAuthenticatedOrReadOnly,
+    )
+
+    def get(self, request, format=None):
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", FEED_LIMIT))
+        except ValueError:
+            return Response({"detail": "since and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_FEED_LIMIT))
+
+        changes = list(iter_changes(since=max(since, 0), limit=limit))
+        cursor = changes[-1]["cursor"] if changes else since
+        return Response({"cursor": cursor, "results": changes})
@@ -0,0 +1,197 @@
+import heapq
+import json
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from django.dispatch import receiver
+from django.utils.six.moves import queue
+from django.utils.six.moves import urllib
+from popit.signals import persons_changed
+
+
+# Partners listed in POPIT_WEBHOOKS are told which persons changed. Changes are collected for a window
+# so a person saved with all its children is announced once, then posted in batches by worker threads.
+# Nothing here runs on the thread that handled the write, a full queue drops notifications rather
+# than blocking it. Partners catching up after drops can read the /changes/ feed.
+
+logger = logging.getLogger(__name__)
+# Delivery failures are for sites that configure logging, Python 2 would complain about the missing handler
+logger.addHandler(logging.NullHandler())
+
+# Which action a person ends up with when it changed several times within a window
+ACTION_PRIORITY = {"updated": 0, "created": 1, "deleted": 2}
+
+
+class WebhookDispatcher(object):
+
+    def __init__(self, urls, window=2.0, workers=2, queue_size=1000, batch_size=100, max_retries=5,
+                 backoff=1.0, timeout=5.0):
+        self.urls = list(urls)
+        self.window = window
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_pending = queue_size * batch_size
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = {}
+        self.retries = []
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.stopped = False
+        self.dropped = 0
+
+        self.threads = [threading.Thread(target=self.flush_loop, name="popit-webhooks-flush")]
+        self.threads.extend(
+            threading.Thread(target=self.work_loop, name="popit-webhooks-%d" % i) for i in range(workers)
+        )
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def notify(self, person_id, action):
+        """
+        Records that person_id changed, returns at once
+        """
+        person_id = str(person_id)
+        with self.lock:
+            previous = self.pending.get(person_id)
+            if previous is None and len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                logger.warning("Webhook notification for person %s dropped, too many pending", person_id)
+                return
+            if previous is None or ACTION_PRIORITY.get(action, 0) > ACTION_PRIORITY.get(previous, 0):
+                self.pending[person_id] = action
+
+    def flush(self):
+        """
+        Queues a batch of everything pending now instead of at the end of the window
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        changes = [{"person": person_id, "action": action} for person_id, action in sorted(pending.items())]
+        for start in range(0, len(changes), self.batch_size):
+            payload = {"changes": changes[start:start + self.batch_size]}
+            for url in self.urls:
+                self.enqueue((url, payload, 0))
+
+    def enqueue(self, job):
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            self.dropped += len(job[1]["changes"])
+            logger.warning("Webhook batch for %s dropped, delivery queue is full", job[0])
+
+    def flush_loop(self):
+        next_flush = time.time() + self.window
+        while not self.stopped:
+            now = time.time()
+            if now >= next_flush:
+                self.flush()
+                next_flush = now + self.window
+            with self.lock:
+                due = []
+                while self.retries and self.retries[0][0] <= now:
+                    due.append(heapq.heappop(self.retries)[1])
+                next_retry = self.retries[0][0] if self.retries else next_flush
+            for job in due:
+                self.enqueue(job)
+            self.wakeup.wait(max(0.0, min(next_flush, next_retry) - time.time()))
+            self.wakeup.clear()
+
+    def work_loop(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                self.deliver(*job)
+            finally:
+                self.jobs.task_done()
+
+    def deliver(self, url, payload, attempt):
+        try:
+            self.post(url, payload)
+            return
+        except urllib.error.HTTPError as error:
+            # The partner refused the payload itself, sending it again will not help
+            if 400 <= error.code < 500 and error.code != 429:
+                logger.warning("Webhook %s refused a batch with status %d", url, error.code)
+                return
+        except Exception as error:
+            logger.info("Webhook %s failed: %s", url, error)
+
+        if attempt >= self.max_retries:
+            logger.warning("Webhook %s gave up a batch after %d attempts", url, attempt + 1)
+            return
+        # Exponential backoff, with jitter so partners coming back are not hit by every worker at once
+        delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+        with self.lock:
+            heapq.heappush(self.retries, (time.time() + delay, (url, payload, attempt + 1)))
+        self.wakeup.set()
+
+    def post(self, url, payload):
+        request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+    def idle(self):
+        with self.lock:
+            return not self.pending and not self.retries and self.jobs.unfinished_tasks == 0
+
+    def join(self, timeout=None):
+        """
+        Flushes and waits until nothing is pending, queued nor waiting for a retry. Returns whether it
+        got there within timeout seconds.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        self.flush()
+        while not self.idle():
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+        for thread in self.threads[1:]:
+            self.jobs.put(None)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    The dispatcher of the POPIT_WEBHOOKS settings, started on first use. None without webhooks.
+    """
+    global _dispatcher
+    urls = getattr(settings, "POPIT_WEBHOOKS", ())
+    if not urls:
+        return None
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            options = getattr(settings, "POPIT_WEBHOOK_OPTIONS", {})
+            _dispatcher = WebhookDispatcher(urls, **options)
+        return _dispatcher
+
+
+@receiver(persons_changed, dispatch_uid="popit_webhooks_notify")
+def persons_changed_handler(sender, changes, **kwargs):
+    dispatcher = get_dispatcher()
+    if dispatcher is not None:
+        for person_id, instance, action in changes:
+            dispatcher.notify(person_id, action)
+
+
+def stop_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.stop()
+        _dispatcher = None
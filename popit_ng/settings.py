@@ -48,6 +48,8 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    # First, so it sees responses last, once every other middleware is done with them
+    'popit.middleware.CompressedResponseCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     #'solid_i18n.middleware.SolidLocaleMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -93,6 +95,25 @@ DATABASES = {
 }
 
 
+# Cache
+# Rendered persons are cached in POPIT_CACHE. The local memory cache is per process, with more than one
+# worker point POPIT_CACHE to a shared backend such as memcached in settings_local.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+POPIT_CACHE = 'default'
+POPIT_CACHE_TIMEOUT = 60 * 60
+# API responses are kept there too, gzip compressed and brotli compressed when the brotli package is
+# installed, see popit/middleware.py.
+
+# Urls told about changed persons, see popit/webhooks.py. POPIT_WEBHOOK_OPTIONS are keyword arguments of
+# WebhookDispatcher: window, workers, queue_size, batch_size, max_retries, backoff and timeout.
+POPIT_WEBHOOKS = ()
+POPIT_WEBHOOK_OPTIONS = {}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
 
@@ -118,6 +139,13 @@ LANGUAGES = (
     ('en', _('English')),
     ('ms', _('Malay'))
 )
+# Languages a missing translation is taken from, in order. Applied field by field to persons and
+# everything nested in them.
+POPIT_LANGUAGE_FALLBACKS = {
+    'ms': ('en',),
+    'en': ('ms',),
+}
+
 LOCALE_PATHS = (
     os.path.join(BASE_DIR, "locale"),
 )
@@ -132,9 +160,22 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAdminUser',
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly',
     ),
+    # Picked by Accept header or by url suffix, see popit/renderers.py
+    'DEFAULT_RENDERER_CLASSES': (
+        'popit.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'popit.renderers.NDJSONRenderer',
+    ),
     'TEST_REQUEST_DEFAULT_FORMAT': 'json'
 }
 
+# MessagePack is only offered when it can be written
+try:
+    import msgpack
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('popit.renderers.MessagePackRenderer',)
+except ImportError:
+    pass
+
 try:
     from settings_local import *
 except:
@@ -16,9 +16,15 @@ Including another URLconf
 from django.conf.urls import include, url, patterns
 from django.contrib import admin
 from django.conf import settings
+from rest_framework.settings import api_settings
 from rest_framework.urlpatterns import format_suffix_patterns
 from popit.views import PersonDetail
 from popit.views import PersonList
+from popit.views import PersonExport
+from popit.views import PersonSearch
+from popit.views import PersonMatch
+from popit.views import IdentifierLookup
+from popit.views import ChangeFeed
 
 urlpatterns = [
     url(r'^admin/', include(admin.site.urls)),
@@ -29,12 +35,22 @@ if "rosetta" in settings.INSTALLED_APPS:
         url(r'rosetta/', include('rosetta.urls'))
     )
 
+# Person ids are uuids, with or without dashes
+UUID_PATTERN = r'[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}'
+
 api_urls = [
     url(r'^(?P<language>\w+)/persons/$', PersonList.as_view()),
-    url(r'^(?P<language>\w+)/persons/(?P<pk>[-\w]+)/$', PersonDetail.as_view()),
+    url(r'^(?P<language>\w+)/persons/(?P<pk>%s)/$' % UUID_PATTERN, PersonDetail.as_view()),
+    url(r'^(?P<language>\w+)/export/$', PersonExport.as_view()),
+    url(r'^(?P<language>\w+)/search/persons/$', PersonSearch.as_view()),
+    url(r'^(?P<language>\w+)/match/persons/$', PersonMatch.as_view()),
+    url(r'^(?P<language>\w+)/identifiers/(?P<scheme>[^/]+)/(?P<identifier>[^/]+)/$', IdentifierLookup.as_view()),
+    url(r'^(?P<language>\w+)/persons/(?P<pk>%s)/matches/$' % UUID_PATTERN, PersonMatch.as_view()),
+    url(r'^changes/$', ChangeFeed.as_view()),
  ]
 
-api_urls = format_suffix_patterns(api_urls)
+# persons.json, persons.ndjson... one suffix per renderer
+api_urls = format_suffix_patterns(api_urls, allowed=[renderer.format for renderer in api_settings.DEFAULT_RENDERER_CLASSES])
 urlpatterns += api_urls
 
 